@@ -0,0 +1,853 @@
+# Requires: pip install opencv-python numpy Pillow
+"""Render a video through the kaleidoscope effects without the preview window.
+
+Frames are processed as fast as the CPU allows rather than at the playback
+rate, so whole clips can be produced offline. Example:
+
+    python batch_render.py input.mp4 output.mp4 --kaleidoscope 8 --lut INFERNO
+
+With --jobs N the timeline is split into N segments rendered by separate
+processes, each with its own decoder, and the parts are joined in order.
+With --frame-workers N one decoder hands frames to N worker processes
+through shared memory and the rendered frames are written back in order.
+
+An input or output of "-" streams headerless raw frames through stdin or
+stdout for use in shell pipelines. Each frame is width * height * 3 bytes in
+--input-pix-fmt / --output-pix-fmt order (bgr24 or rgb24), rows top to
+bottom with no padding. Input frames are --input-size; output frames are
+--size, or the input size when that isn't given. Progress and errors go to
+stderr. For example:
+
+    ffmpeg -i in.mp4 -f rawvideo -pix_fmt bgr24 - |
+        python batch_render.py - - --input-size 1280x720 --kaleidoscope 6 |
+        ffplay -f rawvideo -pixel_format bgr24 -video_size 1280x720 -
+
+--preview-port serves the frames being rendered as an MJPEG stream at
+http://localhost:PORT/ so renders on machines without a display can be
+watched from a browser.
+"""
+import argparse
+import http.server
+import multiprocessing
+import os
+import queue
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_EXCEPTION, wait
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from video_kaleidoscope import EffectRenderer, VideoAttributes, LUTS, get_lut
+
+
+def parse_size(text):
+    try:
+        width, height = (int(value) for value in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got '{text}'")
+    return width, height
+
+
+def attributes_from_args(args):
+    attributes = VideoAttributes()
+    attributes.mirror_left_level = args.mirror_left
+    attributes.mirror_right_level = args.mirror_right
+    attributes.mirror_up = args.mirror_up
+    attributes.mirror_down = args.mirror_down
+    attributes.flip_horizontal = args.flip_horizontal
+    attributes.flip_vertical = args.flip_vertical
+    attributes.rotation_angle = args.rotation
+    attributes.zoom_factor = args.zoom
+    attributes.pan_x, attributes.pan_y = args.pan
+    attributes.kaleidoscope_segments = args.kaleidoscope
+    attributes.brightness = args.brightness
+    return attributes
+
+
+# Encoder arguments for --encoder ffmpeg, placed between the raw video input and the output path
+FFMPEG_ARGS = "-c:v libx264 -preset medium -crf 18 -pix_fmt yuv420p"
+
+
+class FFmpegWriter:
+    """A VideoWriter-like sink that pipes raw BGR frames into an ffmpeg subprocess.
+
+    Frames are handed to a writer thread through a bounded queue so encoding
+    overlaps rendering. write() keeps a reference to the frame instead of
+    copying it, so callers must not modify a frame after writing it.
+    """
+
+    keeps_frames = True
+
+    def __init__(self, output_path, fps, size, ffmpeg_args=FFMPEG_ARGS, queue_frames=16):
+        width, height = size
+        self.size = size
+        self.error = None
+        command = ['ffmpeg', '-y', '-v', 'error', '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+                   '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+                   *shlex.split(ffmpeg_args), output_path]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except OSError as e:
+            print(f"Error: Unable to start ffmpeg: {e}", file=sys.stderr)
+            self.process = None
+            return
+        self.frames = queue.Queue(maxsize=queue_frames)
+        self.thread = threading.Thread(target=self._pipe_frames, daemon=True)
+        self.thread.start()
+
+    def isOpened(self):
+        return self.process is not None and self.error is None and self.process.poll() is None
+
+    def _pipe_frames(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            # After a failure keep draining the queue so write() never blocks
+            if self.error is None:
+                try:
+                    self.process.stdin.write(np.ascontiguousarray(frame).data)
+                except OSError as e:
+                    self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise IOError(f"ffmpeg stopped accepting frames: {self.error}")
+        height, width = frame.shape[:2]
+        if (width, height) != self.size:
+            raise ValueError(f"Frame size {width}x{height} does not match the "
+                             f"{self.size[0]}x{self.size[1]} output")
+        self.frames.put(frame)
+
+    def release(self):
+        """Flush queued frames, close the pipe and wait for ffmpeg to finish.
+
+        Raises IOError if ffmpeg fails, since the output is then incomplete.
+        """
+        if self.process is None:
+            return
+        self.frames.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        status = self.process.wait()
+        self.process = None
+        if status != 0:
+            raise IOError(f"ffmpeg exited with status {status}")
+
+
+# Raw frame layouts for "-" inputs and outputs
+PIXEL_FORMATS = ('bgr24', 'rgb24')
+
+
+class RawFrameReader:
+    """A VideoCapture-like source reading headerless raw frames from a binary stream."""
+
+    def __init__(self, stream, size, fps=30.0, pix_fmt='bgr24'):
+        self.stream = stream
+        self.width, self.height = size
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+
+    def isOpened(self):
+        return self.stream is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return 0  # The frame count of a stream is unknown
+
+    def read(self, image=None):
+        """Read the next frame, into `image` if it has the frame's shape."""
+        shape = (self.height, self.width, 3)
+        if image is None or image.shape != shape or image.dtype != np.uint8:
+            image = np.empty(shape, np.uint8)
+        buffer = memoryview(image).cast('B')
+        filled = 0
+        while filled < len(buffer):
+            count = self.stream.readinto(buffer[filled:])
+            if not count:
+                # A partial frame at the end of the stream is dropped
+                return False, None
+            filled += count
+        if self.pix_fmt == 'rgb24':
+            cv2.cvtColor(image, cv2.COLOR_RGB2BGR, dst=image)
+        return True, image
+
+    def release(self):
+        self.stream = None
+
+
+class RawFrameWriter:
+    """A VideoWriter-like sink writing headerless raw frames to a binary stream."""
+
+    def __init__(self, stream, size, pix_fmt='bgr24'):
+        self.stream = stream
+        self.size = size
+        self.pix_fmt = pix_fmt
+
+    def isOpened(self):
+        return self.stream is not None
+
+    def write(self, frame):
+        height, width = frame.shape[:2]
+        if (width, height) != self.size:
+            raise ValueError(f"Frame size {width}x{height} does not match the "
+                             f"{self.size[0]}x{self.size[1]} output")
+        if self.pix_fmt == 'rgb24':
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.stream.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        if self.stream is not None:
+            try:
+                self.stream.flush()
+            except OSError:
+                pass
+        self.stream = None
+
+
+def open_capture(input_path, input_size=None, input_fps=None, input_pix_fmt='bgr24'):
+    """Open raw frames on stdin for "-", otherwise a cv2.VideoCapture."""
+    if input_path == '-':
+        return RawFrameReader(sys.stdin.buffer, input_size, input_fps or 30.0, input_pix_fmt)
+    return cv2.VideoCapture(input_path)
+
+
+def open_writer(output_path, fps, size, fourcc='mp4v', ffmpeg_args=None, output_pix_fmt='bgr24'):
+    """Open an ffmpeg pipe when ffmpeg_args is given, raw frames on stdout for "-",
+    and otherwise a cv2.VideoWriter."""
+    if ffmpeg_args is not None:
+        return FFmpegWriter(output_path, fps, size, ffmpeg_args)
+    if output_path == '-':
+        return RawFrameWriter(sys.stdout.buffer, size, output_pix_fmt)
+    return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+
+
+def read_frames(cap, frames, stop, limit=None):
+    """Decode on a separate thread so decoding overlaps rendering."""
+    read = 0
+    while not stop.is_set() and (limit is None or read < limit):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.put(frame)
+        read += 1
+    frames.put(None)
+
+
+class PreviewServer:
+    """Serves the latest rendered frame as an MJPEG stream over HTTP.
+
+    publish() only keeps a copy of a frame when one is due at the preview
+    rate; a separate thread scales and JPEG-encodes it, so the render loop
+    never waits on encoding or on slow clients. Only the newest frame is
+    kept, and every client gets whichever frame is current when it is ready.
+    """
+
+    BOUNDARY = 'frame'
+
+    def __init__(self, host='127.0.0.1', port=8080, fps=5.0, max_width=800, quality=70):
+        self.interval = 1.0 / fps
+        self.max_width = max_width
+        self.quality = quality
+        self.publish_time = 0.0
+        self.pending = None  # Frame waiting to be encoded
+        self.jpeg = None
+        self.sequence = 0  # Increases with every encoded frame
+        self.closed = False
+        self.condition = threading.Condition()
+        self.encoder = threading.Thread(target=self._encode_frames, daemon=True)
+        self.encoder.start()
+        self.server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Preview at http://{host}:{self.server.server_address[1]}/", file=sys.stderr)
+
+    def publish(self, frame):
+        now = time.perf_counter()
+        if now - self.publish_time < self.interval:
+            return
+        self.publish_time = now
+        # Copy, since the renderer may reuse the frame's memory
+        with self.condition:
+            self.pending = frame.copy()
+            self.condition.notify_all()
+
+    def _encode_frames(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.closed)
+                if self.closed:
+                    return
+                frame, self.pending = self.pending, None
+            height, width = frame.shape[:2]
+            if width > self.max_width:
+                frame = cv2.resize(frame, (self.max_width, height * self.max_width // width),
+                                   interpolation=cv2.INTER_AREA)
+            ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ret:
+                with self.condition:
+                    self.jpeg = jpeg.tobytes()
+                    self.sequence += 1
+                    self.condition.notify_all()
+
+    def next_jpeg(self, after, timeout=5.0):
+        """Wait for a frame newer than sequence `after`; returns (sequence, jpeg)."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after or self.closed, timeout)
+            return self.sequence, self.jpeg
+
+    def _handler(self):
+        preview = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/':
+                    body = b'<html><body style="margin:0;background:#000">' \
+                           b'<img src="/stream" style="max-width:100%"></body></html>'
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == '/stream':
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'multipart/x-mixed-replace; '
+                                                     f'boundary={preview.BOUNDARY}')
+                    self.send_header('Cache-Control', 'no-cache')
+                    self.end_headers()
+                    sequence = 0
+                    try:
+                        while not preview.closed:
+                            sequence, jpeg = preview.next_jpeg(sequence)
+                            if jpeg is None:
+                                continue
+                            self.wfile.write(
+                                f'--{preview.BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                f'Content-Length: {len(jpeg)}\r\n\r\n'.encode())
+                            self.wfile.write(jpeg)
+                            self.wfile.write(b'\r\n')
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def render_frames(cap, writer, attributes, lut, size, limit=None, on_frame=None, bands=None,
+                  preview=None):
+    """Render up to `limit` frames from cap into writer, returning how many were written."""
+    renderer = EffectRenderer(bands)
+    frames = queue.Queue(maxsize=8)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_frames, args=(cap, frames, stop, limit), daemon=True)
+    reader.start()
+    written = 0
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            frame = renderer.render(frame, attributes, lut, size)
+            writer.write(frame)
+            if preview is not None:
+                preview.publish(frame)
+            written += 1
+            if on_frame is not None:
+                on_frame(written)
+    finally:
+        stop.set()
+        # Unblock the reader if it is waiting on a full queue
+        while reader.is_alive():
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                reader.join(0.1)
+    return written
+
+
+class ProgressReport:
+    """Prints frames done and throughput at most once per interval."""
+
+    def __init__(self, label, total, interval=1.0):
+        self.label = label
+        self.total = f"/{total}" if total > 0 else ""
+        self.interval = interval
+        self.start = self.report_time = time.perf_counter()
+
+    def __call__(self, done):
+        now = time.perf_counter()
+        if now - self.report_time >= self.interval:
+            self.report_time = now
+            print(f"{self.label}: frame {done}{self.total}  "
+                  f"{done / (now - self.start):.1f} fps", file=sys.stderr, flush=True)
+
+    def finish(self, done, output_path):
+        elapsed = time.perf_counter() - self.start
+        print(f"{self.label}: wrote {done} frames to {output_path} in {elapsed:.1f}s "
+              f"({done / elapsed if elapsed > 0 else 0:.1f} fps)", file=sys.stderr)
+
+
+# Frames rendered by all segment workers, and an Event set to stop them
+# early, shared through the pool initializer
+_segment_progress = None
+_segment_cancelled = None
+
+
+def _init_segment_worker(progress, cancelled):
+    global _segment_progress, _segment_cancelled
+    _segment_progress = progress
+    _segment_cancelled = cancelled
+    # One process per core already fills the machine
+    cv2.setNumThreads(1)
+
+
+def _count_segment_frame(written):
+    if _segment_cancelled.is_set():
+        raise RuntimeError("Cancelled after another segment failed")
+    with _segment_progress.get_lock():
+        _segment_progress.value += 1
+
+
+def render_segment(input_path, part_path, attributes, lut, size, fourcc, ffmpeg_args, fps,
+                   start, count):
+    """Worker: render frames [start, start + count) of input_path into part_path.
+
+    A count of None renders through to the end of the file.
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video file {input_path}")
+    writer = open_writer(part_path, fps, size, fourcc, ffmpeg_args)
+    try:
+        if not writer.isOpened():
+            raise IOError(f"Unable to open {part_path} for writing")
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        return render_frames(cap, writer, attributes, lut, size, count, _count_segment_frame,
+                             bands=1)
+    finally:
+        cap.release()
+        writer.release()
+
+
+def concatenate_parts(part_paths, output_path, fourcc, ffmpeg_args, fps, size):
+    """Join the rendered parts in order, without re-encoding when ffmpeg is available."""
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is not None:
+        list_path = output_path + '.parts.txt'
+        with open(list_path, 'w') as f:
+            for part_path in part_paths:
+                escaped = os.path.abspath(part_path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        try:
+            result = subprocess.run(
+                [ffmpeg, '-y', '-v', 'error', '-f', 'concat', '-safe', '0',
+                 '-i', list_path, '-c', 'copy', output_path])
+        finally:
+            os.remove(list_path)
+        if result.returncode == 0:
+            return True
+        print("Warning: ffmpeg could not join the parts; re-encoding them instead.",
+              file=sys.stderr)
+    else:
+        print("Warning: ffmpeg not found; re-encoding the parts to join them, "
+              "which is not lossless for lossy codecs.", file=sys.stderr)
+
+    writer = open_writer(output_path, fps, size, fourcc, ffmpeg_args)
+    if not writer.isOpened():
+        print(f"Error: Unable to open {output_path} for writing", file=sys.stderr)
+        return False
+    try:
+        for part_path in part_paths:
+            cap = cv2.VideoCapture(part_path)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            cap.release()
+    finally:
+        writer.release()
+    return True
+
+
+def render_segments(input_path, output_path, attributes, lut, size, fourcc, ffmpeg_args, fps,
+                    frame_count, jobs, progress):
+    """Split the timeline into `jobs` segments, render them in parallel and join them."""
+    bounds = [frame_count * i // jobs for i in range(jobs + 1)]
+    root, ext = os.path.splitext(output_path)
+    part_paths = [f"{root}.part{i}{ext}" for i in range(jobs)]
+    done = multiprocessing.Value('q', 0)
+    cancelled = multiprocessing.Event()
+    try:
+        with ProcessPoolExecutor(jobs, initializer=_init_segment_worker,
+                                 initargs=(done, cancelled)) as pool:
+            futures = [
+                # The frame count can be an estimate, so the last segment
+                # reads to the end of the file
+                pool.submit(render_segment, input_path, part_path, attributes, lut, size,
+                            fourcc, ffmpeg_args, fps, start,
+                            end - start if i < jobs - 1 else None)
+                for i, (part_path, start, end) in enumerate(
+                    zip(part_paths, bounds, bounds[1:]))]
+            pending = futures
+            while pending:
+                finished, pending = wait(pending, timeout=progress.interval,
+                                         return_when=FIRST_EXCEPTION)
+                failed = next((future for future in futures
+                               if future.done() and not future.cancelled()
+                               and future.exception()), None)
+                if failed is not None:
+                    # Stop the other segments now rather than report the
+                    # failure once they have all finished
+                    cancelled.set()
+                    pool.shutdown(cancel_futures=True)
+                    error = failed.exception()
+                    raise RuntimeError(f"Segment {futures.index(failed)} failed: "
+                                       f"{type(error).__name__}: {error}") from error
+                progress(done.value)
+            written = [future.result() for future in futures]
+        # Parts past the real end of the file are empty
+        parts = [path for path, count in zip(part_paths, written) if count > 0]
+        if not concatenate_parts(parts, output_path, fourcc, ffmpeg_args, fps, size):
+            return None
+        return sum(written)
+    finally:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+
+class SharedFrameSlots:
+    """Shared memory slots, each holding a decoded frame and its rendered result.
+
+    The process that creates the slots owns them and unlinks them on close;
+    workers attach to the same blocks by name.
+    """
+
+    def __init__(self, count, source_shape, output_shape, names=None):
+        self.source_shape = source_shape
+        self.output_shape = output_shape
+        source_bytes = int(np.prod(source_shape))
+        if names is None:
+            size = source_bytes + int(np.prod(output_shape))
+            self.blocks = [shared_memory.SharedMemory(create=True, size=size)
+                           for _ in range(count)]
+        else:
+            self.blocks = [shared_memory.SharedMemory(name=name) for name in names]
+        self.owner = names is None
+        self.sources = [np.ndarray(source_shape, np.uint8, block.buf) for block in self.blocks]
+        self.outputs = [np.ndarray(output_shape, np.uint8, block.buf, offset=source_bytes)
+                        for block in self.blocks]
+
+    def __len__(self):
+        return len(self.blocks)
+
+    @property
+    def names(self):
+        return [block.name for block in self.blocks]
+
+    def close(self):
+        # The array views must go before the buffers they export can close
+        self.sources = self.outputs = None
+        for block in self.blocks:
+            block.close()
+            if self.owner:
+                block.unlink()
+
+
+def _frame_worker(names, source_shape, output_shape, attributes, lut, size, tasks, results):
+    """Worker: render the frame in each slot named on `tasks` into the same slot."""
+    cv2.setNumThreads(1)
+    slots = SharedFrameSlots(len(names), source_shape, output_shape, names)
+    renderer = EffectRenderer(bands=1)
+    try:
+        for slot in iter(tasks.get, None):
+            np.copyto(slots.outputs[slot],
+                      renderer.render(slots.sources[slot], attributes, lut, size))
+            results.put(slot)
+    except Exception as e:
+        # Report failures as text, since not every exception pickles
+        results.put(f"{type(e).__name__}: {e}")
+    finally:
+        slots.close()
+
+
+def _next_result(results, processes, poll_interval=0.5):
+    """results.get(), raising RuntimeError instead of waiting forever once a worker has died."""
+    while True:
+        try:
+            return results.get(timeout=poll_interval)
+        except queue.Empty:
+            # Workers exit cleanly only on a sentinel or after putting their
+            # error on `results`, which still arrives; any other exit means
+            # a worker was killed and its frame will never come
+            for process in processes:
+                if process.exitcode not in (None, 0):
+                    raise RuntimeError(
+                        f"Frame worker exited with status {process.exitcode}")
+
+
+def render_frame_parallel(cap, writer, attributes, lut, size, workers, on_frame=None,
+                          preview=None):
+    """Decode sequentially and render frames on `workers` processes, writing them in order.
+
+    Frames reach the workers through shared memory slots, decoded straight
+    into place, so only slot numbers are pickled. Two slots per worker keep
+    every worker busy while the writer waits for the oldest frame.
+    """
+    ret, frame = cap.read()
+    if not ret:
+        return 0
+    width, height = size
+    slots = SharedFrameSlots(2 * workers, frame.shape, (height, width, 3))
+    tasks, results = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_frame_worker, daemon=True,
+            args=(slots.names, frame.shape, (height, width, 3), attributes, lut, size,
+                  tasks, results))
+        for _ in range(workers)]
+    free = list(range(len(slots) - 1, 0, -1))
+    slot_frames = {0: 0}  # Frame index of each slot a worker is rendering
+    rendered = {}  # Slot of each rendered frame waiting for its turn to be written
+    read, written = 1, 0
+    try:
+        for process in processes:
+            process.start()
+        np.copyto(slots.sources[0], frame)
+        tasks.put(0)
+        end_of_file = False
+        # Every slot can be written and free again before the end of the
+        # input, so the loop runs until the input is exhausted as well
+        while not end_of_file or slot_frames or rendered:
+            if free and not end_of_file:
+                slot = free.pop()
+                ret, _ = cap.read(slots.sources[slot])
+                if ret:
+                    slot_frames[slot] = read
+                    read += 1
+                    tasks.put(slot)
+                else:
+                    free.append(slot)
+                    end_of_file = True
+                continue
+            result = _next_result(results, processes)
+            if isinstance(result, str):
+                raise RuntimeError(f"Frame worker failed: {result}")
+            rendered[slot_frames.pop(result)] = result
+            # Write every frame that is now next in order
+            while written in rendered:
+                slot = rendered.pop(written)
+                # The slot is reused right away, so sinks that hold on
+                # to frames get a copy
+                output = slots.outputs[slot]
+                writer.write(output.copy() if getattr(writer, 'keeps_frames', False) else output)
+                if preview is not None:
+                    preview.publish(output)
+                free.append(slot)
+                written += 1
+                if on_frame is not None:
+                    on_frame(written)
+        if written != read:
+            raise RuntimeError(f"Read {read} frames but wrote {written}")
+    finally:
+        # Any worker may take any sentinel, so send one per worker even if
+        # some have already exited
+        for _ in processes:
+            tasks.put(None)
+        for process in processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        slots.close()
+    return written
+
+
+def render_video(input_path, output_path, attributes, lut=None, size=None,
+                 fourcc='mp4v', jobs=1, frame_workers=1, bands=None, ffmpeg_args=None,
+                 input_size=None, input_fps=None, input_pix_fmt='bgr24',
+                 output_pix_fmt='bgr24', preview=None, progress_interval=1.0):
+    """Apply the effects to every frame of input_path and write them to output_path.
+
+    Frames are encoded by cv2.VideoWriter with `fourcc`, or piped to ffmpeg
+    with `ffmpeg_args` as its encoder arguments when those are given. A path
+    of "-" reads raw input_size frames from stdin, or writes raw frames to
+    stdout. Rendered frames are also published to `preview`, a PreviewServer,
+    when one is given.
+
+    Returns the number of frames written, or None if either file can't be opened.
+    """
+    cap = open_capture(input_path, input_size, input_fps, input_pix_fmt)
+    if not cap.isOpened():
+        print(f"Error: Unable to open video file {input_path}", file=sys.stderr)
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if size is None:
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    progress = ProgressReport('stdin' if input_path == '-' else input_path,
+                              frame_count, progress_interval)
+
+    if jobs > 1 and frame_count >= jobs:
+        cap.release()
+        try:
+            written = render_segments(input_path, output_path, attributes, lut, size, fourcc,
+                                      ffmpeg_args, fps, frame_count, jobs, progress)
+        except (RuntimeError, IOError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return None
+    else:
+        writer = open_writer(output_path, fps, size, fourcc, ffmpeg_args, output_pix_fmt)
+        if not writer.isOpened():
+            print(f"Error: Unable to open {output_path} for writing", file=sys.stderr)
+            cap.release()
+            try:
+                writer.release()
+            except IOError:
+                pass  # ffmpeg failing to start is the error already reported
+            return None
+        try:
+            try:
+                if frame_workers > 1:
+                    written = render_frame_parallel(cap, writer, attributes, lut, size,
+                                                    frame_workers, progress, preview)
+                else:
+                    written = render_frames(cap, writer, attributes, lut, size,
+                                            on_frame=progress, bands=bands, preview=preview)
+            finally:
+                cap.release()
+                # Raises if the encoder failed after taking every frame
+                writer.release()
+        except (RuntimeError, IOError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            written = None
+
+    if written is not None:
+        progress.finish(written, 'stdout' if output_path == '-' else output_path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Apply Video Kaleidoscope effects to a video file without the UI.")
+    parser.add_argument('input', help="video file to read, or - for raw frames on stdin")
+    parser.add_argument('output', help="video file to write, or - for raw frames on stdout")
+    parser.add_argument('--mirror-left', type=int, choices=range(4), default=0,
+                        help="left mirror level (0 off, 1 center, 2 thirds, 3 quarters)")
+    parser.add_argument('--mirror-right', type=int, choices=range(4), default=0,
+                        help="right mirror level (0 off, 1 center, 2 thirds, 3 quarters)")
+    parser.add_argument('--mirror-up', action='store_true', help="mirror the top half to the bottom")
+    parser.add_argument('--mirror-down', action='store_true', help="mirror the bottom half to the top")
+    parser.add_argument('--flip-horizontal', action='store_true')
+    parser.add_argument('--flip-vertical', action='store_true')
+    parser.add_argument('--rotation', type=float, default=0, help="rotation angle in degrees")
+    parser.add_argument('--zoom', type=float, default=1.0, help="zoom factor, 1 for none")
+    parser.add_argument('--pan', type=int, nargs=2, default=(0, 0), metavar=('X', 'Y'),
+                        help="pan offset in output pixels when zoomed in")
+    parser.add_argument('--kaleidoscope', type=int, default=0, metavar='SEGMENTS',
+                        help="kaleidoscope segments, 0 for none")
+    parser.add_argument('--brightness', type=int, default=0, help="brightness level, -4 to 4")
+    parser.add_argument('--lut', default="None",
+                        help="LUT name: " + ", ".join(sorted(LUTS)) + ", or one from --lut-bundle")
+    parser.add_argument('--lut-bundle', action='append', default=[], metavar='PATH',
+                        help="also look LUTs up in this LUT bundle (repeatable)")
+    parser.add_argument('--size', type=parse_size, help="output size as WIDTHxHEIGHT (default: input size)")
+    parser.add_argument('--encoder', choices=('opencv', 'ffmpeg'), default='opencv',
+                        help="encode with cv2.VideoWriter, or pipe raw frames to an ffmpeg process")
+    parser.add_argument('--fourcc', default='mp4v', help="VideoWriter codec (default: mp4v)")
+    parser.add_argument('--ffmpeg-args', default=FFMPEG_ARGS,
+                        help=f"ffmpeg output arguments for --encoder ffmpeg (default: '{FFMPEG_ARGS}')")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="render this many segments in parallel processes "
+                             f"(default: 1, this machine has {os.cpu_count()} cores)")
+    parser.add_argument('--frame-workers', type=int, default=1,
+                        help="decode once and render frames on this many processes, "
+                             "for sources that seek slowly (default: 1)")
+    parser.add_argument('--input-size', type=parse_size,
+                        help="frame size of raw frames on stdin as WIDTHxHEIGHT")
+    parser.add_argument('--input-fps', type=float, default=30.0,
+                        help="frame rate of raw frames on stdin (default: 30)")
+    parser.add_argument('--input-pix-fmt', choices=PIXEL_FORMATS, default='bgr24',
+                        help="channel order of raw frames on stdin (default: bgr24)")
+    parser.add_argument('--output-pix-fmt', choices=PIXEL_FORMATS, default='bgr24',
+                        help="channel order of raw frames on stdout (default: bgr24)")
+    parser.add_argument('--preview-port', type=int,
+                        help="serve an MJPEG preview of the render on this port")
+    parser.add_argument('--preview-host', default='127.0.0.1',
+                        help="address the preview listens on; 0.0.0.0 for the whole "
+                             "network (default: 127.0.0.1)")
+    parser.add_argument('--preview-fps', type=float, default=5.0,
+                        help="frames per second sent to the preview (default: 5)")
+    parser.add_argument('--bands', type=int,
+                        help="split each frame into this many row bands rendered on threads "
+                             "(default: one per core; worker processes always use 1)")
+    args = parser.parse_args(argv)
+    if args.jobs > 1 and args.frame_workers > 1:
+        parser.error("--jobs and --frame-workers can't be combined")
+    if args.input == '-' and args.input_size is None:
+        parser.error("reading raw frames from stdin needs --input-size")
+    if args.jobs > 1 and '-' in (args.input, args.output):
+        parser.error("--jobs needs seekable files, not stdin or stdout")
+    if args.jobs > 1 and args.preview_port is not None:
+        parser.error("--preview-port can't be combined with --jobs")
+    if args.zoom < 1:
+        parser.error("--zoom must be at least 1")
+    if args.preview_fps <= 0:
+        parser.error("--preview-fps must be above 0")
+
+    for bundle_path in args.lut_bundle:
+        try:
+            LUTS.add_bundle(bundle_path)
+        except (OSError, ValueError) as e:
+            parser.error(f"can't load LUT bundle {bundle_path}: {e}")
+    lut = None
+    if args.lut != "None":
+        lut = get_lut(args.lut)
+        if lut is None:
+            parser.error(f"LUT '{args.lut}' not found")
+
+    preview = None
+    if args.preview_port is not None:
+        try:
+            preview = PreviewServer(args.preview_host, args.preview_port, args.preview_fps)
+        except OSError as e:
+            print(f"Error: Unable to start the preview server: {e}", file=sys.stderr)
+            return 1
+    try:
+        written = render_video(args.input, args.output, attributes_from_args(args), lut,
+                               args.size, args.fourcc, args.jobs, args.frame_workers,
+                               args.bands, args.ffmpeg_args if args.encoder == 'ffmpeg' else None,
+                               args.input_size, args.input_fps, args.input_pix_fmt,
+                               args.output_pix_fmt, preview)
+    finally:
+        if preview is not None:
+            preview.close()
+    return 1 if written is None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,15 +2,43 @@
 import sys
 from datetime import datetime
 import threading
-import tkinter as tk
-from tkinter import OptionMenu, StringVar, Toplevel, Frame, LabelFrame
+import time
 import cv2
 import numpy as np
-from PIL import Image, ImageTk
+try:
+    import tkinter as tk
+    from tkinter import OptionMenu, StringVar, Toplevel, Frame, LabelFrame
+    from PIL import Image, ImageTk
+except ImportError:
+    # Only the viewer needs Tk; batch_render.py imports the rendering code
+    # from here on machines that may not have it
+    tk = None
 import os
-import ast
-
-LUTS = {
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Frames larger than this are shown downscaled, and previewed from a proxy
+DISPLAY_WIDTH, DISPLAY_HEIGHT = 800, 600
+
+# Read-ahead ring for the decoder thread, sized by memory unless a frame count is given
+RING_BUFFER_FRAMES = None
+RING_BUFFER_BYTES = 256 * 1024 * 1024
+# Memory budget for the frames of one GOP decoded at a time for reverse playback,
+# and the frames per chunk when the file has no keyframe index
+REVERSE_CHUNK_BYTES = 1024 * 1024 * 1024
+REVERSE_CHUNK_FRAMES = 32
+# Memory budget for recently shown frames kept for stepping and scrubbing
+FRAME_CACHE_BYTES = 512 * 1024 * 1024
+# Poll interval while playing and waiting on the decoder, in ms
+BEHIND_POLL_MS = 4
+# Horizontal bands each effect stage is split into across threads; None for one per core
+RENDER_BANDS = None
+
+# Colormap ids, or functions building a (256, 1, 3) table, by LUT name
+BUILTIN_LUTS = {
     'AUTUMN': cv2.COLORMAP_AUTUMN,
     'BONE': cv2.COLORMAP_BONE,
     'CIVIDIS': cv2.COLORMAP_CIVIDIS,
@@ -46,33 +74,452 @@ LUTS = {
     'WINTER': cv2.COLORMAP_WINTER
 }
 
-# Load custom LUTs from a directory
-lut_directory = "./luts"
-for filename in os.listdir(lut_directory):
-    if filename.endswith('.lut'):
-        filepath = os.path.join(lut_directory, filename)
+
+def file_stamp(path):
+    """Size and modification time of a file, to tell when files derived from it are stale."""
+    stat = os.stat(path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def lut_cache_path(filepath):
+    directory, filename = os.path.split(filepath)
+    return os.path.join(directory, LUT_CACHE_DIRECTORY, filename + '.bin')
+
+
+def load_cached_lut(filepath):
+    """Return the compiled LUT cached for a .lut file, or None if missing or stale.
+
+    A cache file is the source's file_stamp as two int64s followed by the
+    (256, 1, 3) uint8 table, read in one call.
+    """
+    try:
+        data = np.fromfile(lut_cache_path(filepath), dtype=np.uint8)
+        if len(data) == 16 + 256 * 3 and np.array_equal(
+                data[:16].view(np.int64), file_stamp(filepath)):
+            return data[16:].reshape((256, 1, 3))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def save_cached_lut(filepath, lut):
+    cache_path = lut_cache_path(filepath)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            f.write(file_stamp(filepath).tobytes() + np.ascontiguousarray(lut).tobytes())
+    except OSError as e:
+        print(f"Warning: Unable to cache LUT {filepath}: {e}", file=sys.stderr)
+
+
+# Blanks out everything in a .lut file except the numbers
+LUT_SEPARATORS = str.maketrans('[](),', '     ')
+LUT_INVALID_CHARACTER = re.compile(r'[^\d\s\[\](),+-]')
+LUT_COLOR = re.compile(r'\(([^()]*)\)')
+
+
+def parse_lut_text(text):
+    """Parse the text of a .lut file, a list of 256 3-tuple colors, into a (256, 1, 3) array.
+
+    The numbers are read in one pass straight into an array instead of
+    building Python tuples. Raises ValueError saying what is wrong and where.
+    """
+    text = text.strip()
+    if not (text.startswith('[') and text.endswith(']')):
+        raise ValueError("File must contain a list of color tuples.")
+    invalid = LUT_INVALID_CHARACTER.search(text)
+    if invalid is not None:
+        line = text.count('\n', 0, invalid.start()) + 1
+        raise ValueError(f"Unexpected character {invalid.group()!r} on line {line}.")
+    try:
+        values = np.fromstring(text.translate(LUT_SEPARATORS), dtype=np.int64, sep=' ')
+    except ValueError:
+        raise ValueError("Malformed number in the color list.")
+    colors = text.count('(')
+    if colors != text.count(')') or values.size != 3 * colors:
+        # Only now look at the colors one by one, to say which is malformed
+        for number, match in enumerate(LUT_COLOR.finditer(text)):
+            components = len(match.group(1).replace(',', ' ').split())
+            if components != 3:
+                raise ValueError(f"Color {number} has {components} components, expected 3.")
+        raise ValueError("Expected a list of 3-tuple colors.")
+    if colors != 256:
+        raise ValueError(f"Expected 256 colors, found {colors}.")
+    out_of_range = np.flatnonzero((values < 0) | (values > 255))
+    if out_of_range.size:
+        position = out_of_range[0]
+        raise ValueError(f"Color {position // 3} channel {position % 3} is "
+                         f"{values[position]}, outside 0-255.")
+    return values.astype(np.uint8).reshape((256, 1, 3))
+
+
+def load_lut_file(filepath, save_cache=True):
+    """Load a .lut file of 256 color tuples as a (256, 1, 3) array, or None if invalid.
+
+    Parsed LUTs are cached as arrays and the text is only parsed again when
+    the file changes. With save_cache False an existing cache is still used
+    but none is written, leaving the LUT's directory untouched.
+    """
+    lut_array = load_cached_lut(filepath)
+    if lut_array is not None:
+        return lut_array
+    filename = os.path.basename(filepath)
+    try:
+        with open(filepath, 'r') as f:
+            lut_array = parse_lut_text(f.read())
+    except ValueError as e:
+        print(f"Invalid format in LUT file: {filename}. {e}", file=sys.stderr)
+        return None
+    except OSError as e:
+        print(f"Error loading LUT file {filename}: {e}", file=sys.stderr)
+        return None
+    if save_cache:
+        save_cached_lut(filepath, lut_array)
+    return lut_array
+
+
+def load_lut_files(filepaths, workers=None, save_cache=True):
+    """load_lut_file for many files at once, on a thread pool; results in the same order.
+
+    File reads and cache checks dominate for large folders, and overlap well
+    across threads.
+    """
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(load_lut_file, filepaths, [save_cache] * len(filepaths)))
+
+
+class CubeLut:
+    """A 3D LUT from a .cube file, applied as one gather from a precompiled direct table.
+
+    The cube is resampled once, by trilinear interpolation, on a grid of
+    2 ** TABLE_BITS levels per channel, and each pixel then reads the entry
+    its top TABLE_BITS bits of B, G and R point at. With 7 bits the table
+    has 2M entries (8 MB), and the gather replaces eight lattice reads and
+    the blending per pixel. Tables are built on first use and kept, one per
+    output channel order.
+    """
+
+    TABLE_BITS = 7
+
+    def __init__(self, cube, domain_min=(0.0, 0.0, 0.0), domain_max=(1.0, 1.0, 1.0), title=''):
+        # (N, N, N, 3) RGB outputs, indexed [b][g][r] as in the file, where red varies fastest
+        self.cube = np.asarray(cube, dtype=np.float32)
+        self.cube.flags.writeable = False
+        self.domain_min = np.asarray(domain_min, dtype=np.float64)
+        self.domain_max = np.asarray(domain_max, dtype=np.float64)
+        self.title = title
+        self.tables = {}
+
+    def __getstate__(self):
+        # Worker processes rebuild tables rather than receive megabytes of them
+        state = self.__dict__.copy()
+        state['tables'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.cube = self.cube.copy()
+        self.cube.flags.writeable = False
+
+    @property
+    def size(self):
+        return self.cube.shape[0]
+
+    def inverted(self):
+        """The LUT applied to the negative of the input, as invert_lut does for 1D LUTs."""
+        return CubeLut(self.cube[::-1, ::-1, ::-1], self.domain_min, self.domain_max, self.title)
+
+    def index_table(self, levels):
+        """int32 (256, 1, 3) cv2.LUT table turning a BGR pixel into its table index parts.
+
+        levels maps each 8-bit value first, such as brightness; the parts of
+        a pixel OR together into its entry in table().
+        """
+        bits = self.TABLE_BITS
+        codes = levels.astype(np.int32) >> (8 - bits)
+        return np.ascontiguousarray(
+            np.stack([codes << (2 * bits), codes << bits, codes], axis=1).reshape((256, 1, 3)))
+
+    def table(self, rgb=False):
+        """The direct table as uint32s, each holding an output color's bytes in channel order."""
+        if rgb not in self.tables:
+            self.tables[rgb] = self._compile(rgb)
+        return self.tables[rgb]
+
+    def _compile(self, rgb):
+        levels = 1 << self.TABLE_BITS
+        step = 256 // levels
+        # Each entry stands for the middle of the 8-bit codes sharing its top bits
+        values = (np.arange(levels) * step + (step - 1) / 2) / 255
+        samples = self.cube
+        # Trilinear interpolation on a grid factors into one linear interpolation
+        # per axis: along red (the last lattice axis), then green, then blue
+        for axis, channel in ((2, 0), (1, 1), (0, 2)):
+            span = self.domain_max[channel] - self.domain_min[channel]
+            position = np.clip((values - self.domain_min[channel]) / span, 0, 1) * (self.size - 1)
+            lower = np.minimum(position.astype(np.intp), self.size - 2)
+            weight = (position - lower).astype(np.float32)
+            shape = [1, 1, 1, 1]
+            shape[axis] = levels
+            weight = weight.reshape(shape)
+            below = np.take(samples, lower, axis=axis)
+            above = np.take(samples, lower + 1, axis=axis)
+            samples = below + (above - below) * weight
+        colors = np.clip(samples * 255 + 0.5, 0, 255).astype(np.uint8).reshape((-1, 3))
+        packed = np.zeros((len(colors), 4), np.uint8)
+        packed[:, :3] = colors if rgb else colors[:, ::-1]
+        return packed.view(np.uint32).reshape(-1)
+
+    @staticmethod
+    def apply(rows, index_table, table, output):
+        """Look up every pixel of rows in a table(), writing 3-channel colors to output."""
+        parts = cv2.LUT(rows, index_table)
+        index = np.bitwise_or(parts[..., 0], parts[..., 1])
+        np.bitwise_or(index, parts[..., 2], out=index)
+        colors = np.take(table, index, mode='clip').view(np.uint8)
+        return cv2.cvtColor(colors.reshape(rows.shape[:2] + (4,)), cv2.COLOR_BGRA2BGR, dst=output)
+
+
+CUBE_KEYWORD = re.compile(r'[A-Za-z_]')
+
+
+def parse_cube_text(text):
+    """Parse the text of a .cube file into a CubeLut, or a (256, 1, 3) array for a 1D LUT.
+
+    Keywords come first, then one "R G B" row per lattice point with red
+    varying fastest; the rows are read in one pass straight into an array.
+    Raises ValueError saying what is wrong and where.
+    """
+    lines = text.splitlines()
+    title, size, dimensions = '', None, None
+    domain_min, domain_max = [0.0] * 3, [1.0] * 3
+    data_start = len(lines)
+    for number, line in enumerate(lines):
+        words = line.split()
+        if not words or words[0].startswith('#'):
+            continue
+        if not CUBE_KEYWORD.match(words[0]):
+            data_start = number
+            break
+        keyword, arguments = words[0].upper(), words[1:]
         try:
-            with open(filepath, 'r') as f:
-                # Expect the file to contain only a list of tuples
-                lut_data = f.read().strip()
-                if lut_data.startswith('[') and lut_data.endswith(']'):
-                    lut_values = ast.literal_eval(lut_data)
-                    if isinstance(lut_values, list) and all(isinstance(color, tuple) and len(color) == 3 for color in lut_values):
-                        lut_name = os.path.splitext(filename)[0]
-                        lut_array = np.array(
-                            lut_values, dtype=np.uint8).reshape((256, 1, 3))
-                        LUTS[lut_name] = lut_array
-                        print(f"Loaded custom LUT: {lut_name}")
-                    else:
-                        print(
-                            f"Invalid format in LUT file: {filename}. Expected a list of 3-tuple colors.")
+            if keyword == 'TITLE':
+                title = line.split(None, 1)[1].strip().strip('"') if arguments else ''
+            elif keyword in ('LUT_1D_SIZE', 'LUT_3D_SIZE'):
+                size, dimensions = int(arguments[0]), int(keyword[4])
+            elif keyword in ('DOMAIN_MIN', 'DOMAIN_MAX'):
+                bounds = [float(argument) for argument in arguments]
+                if len(bounds) != 3:
+                    raise ValueError
+                if keyword == 'DOMAIN_MIN':
+                    domain_min = bounds
                 else:
-                    print(
-                        f"Invalid format in LUT file: {filename}. File must contain a list of color tuples.")
-        except (SyntaxError, ValueError) as e:
-            print(f"Error loading LUT file {filename}: {e}")
-        except Exception as e:
-            print(f"Unexpected error loading LUT file {filename}: {e}")
+                    domain_max = bounds
+            elif keyword in ('LUT_1D_INPUT_RANGE', 'LUT_3D_INPUT_RANGE'):
+                low, high = (float(argument) for argument in arguments)
+                domain_min, domain_max = [low] * 3, [high] * 3
+        except (ValueError, IndexError):
+            raise ValueError(f"Malformed {keyword} on line {number + 1}.")
+    if size is None:
+        raise ValueError("Missing LUT_3D_SIZE or LUT_1D_SIZE.")
+    if size < 2 or (dimensions == 3 and size > 256) or (dimensions == 1 and size > 65536):
+        raise ValueError(f"Unsupported LUT size {size}.")
+    if any(high <= low for low, high in zip(domain_min, domain_max)):
+        raise ValueError("DOMAIN_MAX must be above DOMAIN_MIN on every channel.")
+    data = lines[data_start:]
+    if any(line.lstrip().startswith('#') for line in data):
+        data = [line for line in data if not line.lstrip().startswith('#')]
+    try:
+        values = np.fromstring(' '.join(data), dtype=np.float32, sep=' ')
+    except ValueError:
+        values = None
+    expected = size ** dimensions
+    if values is None or values.size != 3 * expected:
+        # Only now look at the rows one by one, to say which is malformed
+        for number, line in enumerate(lines[data_start:], data_start + 1):
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+            try:
+                [float(word) for word in words]
+            except ValueError:
+                raise ValueError(f"Malformed number on line {number}.")
+            if len(words) != 3:
+                raise ValueError(f"Line {number} has {len(words)} components, expected 3.")
+        raise ValueError(f"Expected {expected} colors, found {len(values) // 3}.")
+    colors = values.reshape((expected, 3))
+    if dimensions == 1:
+        # A 1D .cube is a curve per channel, resampled to the 256 entries cv2.LUT takes
+        inputs = np.arange(256) / 255
+        curves = [np.interp((inputs - domain_min[c]) / (domain_max[c] - domain_min[c]),
+                            np.linspace(0, 1, size), colors[:, c]) for c in (2, 1, 0)]
+        return np.clip(np.stack(curves, axis=1) * 255 + 0.5, 0, 255).astype(
+            np.uint8).reshape((256, 1, 3))
+    return CubeLut(colors.reshape((size, size, size, 3)), domain_min, domain_max, title)
+
+
+def load_cube_file(filepath):
+    """Load a .cube file as a CubeLut, or a (256, 1, 3) array if 1D, or None if invalid."""
+    filename = os.path.basename(filepath)
+    try:
+        with open(filepath, 'r') as f:
+            return parse_cube_text(f.read())
+    except ValueError as e:
+        print(f"Invalid format in LUT file: {filename}. {e}", file=sys.stderr)
+    except OSError as e:
+        print(f"Error loading LUT file {filename}: {e}", file=sys.stderr)
+    return None
+
+
+class LutBundle(Mapping):
+    """Many LUTs in one file: a name index and a (N, 256, 3) uint8 table, memory-mapped.
+
+    The file starts with MAGIC, then the LUT count and the byte length of
+    the names as little-endian uint32s, then the names as newline-separated
+    UTF-8, padded to a multiple of 64 bytes, then the tables. The tables are
+    mapped read-only, so every process using a bundle shares the same
+    page-cached memory and nothing is parsed.
+    """
+
+    MAGIC = b'VKLUTB1\n'
+    SUFFIX = '.vklutbundle'
+    HEADER = np.dtype([('count', '<u4'), ('names_length', '<u4')])
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f"{path} is not a LUT bundle")
+            header = np.frombuffer(f.read(self.HEADER.itemsize), self.HEADER)[0]
+            count, names_length = int(header['count']), int(header['names_length'])
+            names = f.read(names_length).decode('utf-8').split('\n') if count else []
+        if len(names) != count:
+            raise ValueError(f"{path} has a damaged name index")
+        self.index = {name: i for i, name in enumerate(names)}
+        offset = self.data_offset(names_length)
+        if count:
+            self.tables = np.memmap(path, dtype=np.uint8, mode='r', offset=offset,
+                                    shape=(count, 256, 3))
+        else:
+            self.tables = np.empty((0, 256, 3), np.uint8)
+
+    @classmethod
+    def data_offset(cls, names_length):
+        offset = len(cls.MAGIC) + cls.HEADER.itemsize + names_length
+        return -(-offset // 64) * 64
+
+    def __getitem__(self, lut_name):
+        return self.tables[self.index[lut_name]].reshape((256, 1, 3))
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def build(cls, bundle_path, directories):
+        """Bundle every .lut file under the directories, named by path relative to its directory.
+
+        Returns the number of LUTs written. Nothing is written to the source
+        directories, which may be a shared read-only library.
+        """
+        names, filepaths = [], []
+        for directory in directories:
+            for root, subdirectories, filenames in os.walk(directory):
+                subdirectories[:] = sorted(d for d in subdirectories if d != LUT_CACHE_DIRECTORY)
+                for filename in sorted(filenames):
+                    if filename.endswith('.lut'):
+                        filepath = os.path.join(root, filename)
+                        name = os.path.splitext(os.path.relpath(filepath, directory))[0]
+                        names.append(name.replace(os.sep, '/'))
+                        filepaths.append(filepath)
+        loaded = load_lut_files(filepaths, save_cache=False)
+        luts = {name: lut for name, lut in zip(names, loaded) if lut is not None}
+        names = '\n'.join(luts).encode('utf-8')
+        header = np.array([(len(luts), len(names))], cls.HEADER)
+        # Written under a temporary name so a bundle is never seen half written
+        partial_path = bundle_path + '.part'
+        with open(partial_path, 'wb') as f:
+            f.write(cls.MAGIC + header.tobytes() + names)
+            f.write(bytes(cls.data_offset(len(names)) - f.tell()))
+            for lut in luts.values():
+                f.write(np.ascontiguousarray(lut, dtype=np.uint8).tobytes())
+        os.replace(partial_path, bundle_path)
+        return len(luts)
+
+
+class LutRegistry(Mapping):
+    """LUTs by name, each built or loaded the first time it is looked up.
+
+    Only names are known up front: the built-in LUTs, the contents of LUT
+    bundles, and one per .lut or .cube file in the scanned directories, which take
+    precedence over bundled LUTs of the same name. A lookup runs the
+    built-in's function, loads the file or maps the bundle entry once and
+    keeps the result, made read-only since every caller shares it. Files
+    that fail to load are dropped from the registry.
+    """
+
+    def __init__(self, builtins, directories=()):
+        self.sources = dict(builtins)
+        self.loaded = {}
+        for directory in directories:
+            self.add_directory(directory)
+
+    def add_directory(self, directory):
+        """Register the bundles and LUT files in directory, files by name without extension."""
+        filenames = sorted(os.listdir(directory))
+        for filename in filenames:
+            if filename.endswith(LutBundle.SUFFIX):
+                try:
+                    self.add_bundle(os.path.join(directory, filename))
+                except (OSError, ValueError) as e:
+                    print(f"Error loading LUT bundle {filename}: {e}", file=sys.stderr)
+        for filename in filenames:
+            if filename.endswith(('.lut', '.cube')):
+                self.sources[os.path.splitext(filename)[0]] = os.path.join(directory, filename)
+
+    def add_bundle(self, bundle):
+        """Register every LUT in a LutBundle, or the bundle file at that path."""
+        if isinstance(bundle, str):
+            bundle = LutBundle(bundle)
+        for lut_name in bundle:
+            self.sources[lut_name] = bundle
+            self.loaded.pop(lut_name, None)
+        return bundle
+
+    def __getitem__(self, lut_name):
+        if lut_name in self.loaded:
+            return self.loaded[lut_name]
+        source = self.sources[lut_name]
+        if isinstance(source, str):
+            lut = load_cube_file(source) if source.endswith('.cube') else load_lut_file(source)
+            if lut is None:
+                del self.sources[lut_name]
+                raise KeyError(lut_name)
+            print(f"Loaded custom LUT: {lut_name}", file=sys.stderr)
+        elif isinstance(source, LutBundle):
+            lut = source[lut_name]
+        elif callable(source):
+            lut = source()
+        else:
+            lut = source
+        if isinstance(lut, np.ndarray):
+            lut.flags.writeable = False
+        self.loaded[lut_name] = lut
+        return lut
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __len__(self):
+        return len(self.sources)
+
+
+# Custom LUTs come from the directory next to this script
+lut_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "luts")
+LUT_CACHE_DIRECTORY = "__lutcache__"
+LUTS = LutRegistry(BUILTIN_LUTS, [lut_directory])
 
 
 def create_custom_lut(color, color_gradient_step):
@@ -124,6 +571,11 @@ def create_custom_lut(color, color_gradient_step):
     return custom_lut
 
 
+def get_lut(lut_name):
+    """Look up a LUT by name: a colormap id, a (256, 1, 3) array, or None if unknown."""
+    return LUTS.get(lut_name)
+
+
 class VideoAttributes:
     def __init__(self):
         self.mirror_left_level = 0
@@ -143,16 +595,1023 @@ class VideoAttributes:
         self.brightness = 0  # Set brightness to 0 by default
 
 
+class FrameRing:
+    """Bounded ring of preallocated frame slots filled by a single decoder thread."""
+
+    def __init__(self, frame_shape, capacity=None, max_bytes=None):
+        self.requested_capacity = capacity
+        self.max_bytes = max_bytes
+        self.generation = 0  # Bumped by clear() to invalidate pending writes
+        self.condition = threading.Condition()
+        self.reset(frame_shape)
+
+    def reset(self, frame_shape):
+        """Drop all frames and reallocate the slots for a new frame shape."""
+        frame_bytes = int(np.prod(frame_shape))
+        capacity, max_bytes = self.requested_capacity, self.max_bytes
+        if capacity is None:
+            capacity = (max_bytes or RING_BUFFER_BYTES) // frame_bytes
+        elif max_bytes is not None:
+            capacity = min(capacity, max_bytes // frame_bytes)
+        with self.condition:
+            self.capacity = max(2, int(capacity))
+            self.slots = np.empty((self.capacity,) + tuple(frame_shape), dtype=np.uint8)
+            self.indices = [-1] * self.capacity
+            self.head = 0  # Oldest ready slot
+            self.count = 0  # Number of ready slots
+            self.dropped = 0  # Frames skipped by pop_latest() for being late
+            self.generation += 1
+            self.condition.notify_all()
+
+    def reserve(self, timeout=None):
+        """Wait for a free slot and return (slot, generation), or None on timeout."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.count < self.capacity, timeout):
+                return None
+            return (self.head + self.count) % self.capacity, self.generation
+
+    def commit(self, slot, generation, index):
+        """Publish a filled slot, unless the ring was cleared while it was being written."""
+        with self.condition:
+            if generation != self.generation or slot != (self.head + self.count) % self.capacity:
+                return False
+            self.indices[slot] = index
+            self.count += 1
+            self.condition.notify_all()
+            return True
+
+    def pop(self):
+        """Return (index, frame) for the next ready frame, or None if none is ready."""
+        with self.condition:
+            if self.count == 0:
+                return None
+            slot = self.head
+            index, frame = self.indices[slot], self.slots[slot].copy()
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.condition.notify_all()
+            return index, frame
+
+    def pop_latest(self, is_due):
+        """Return (index, frame) for the newest ready frame that is due, dropping older due frames."""
+        with self.condition:
+            due = 0
+            while due < self.count and is_due(self.indices[(self.head + due) % self.capacity]):
+                due += 1
+            if due == 0:
+                return None
+            self.head = (self.head + due - 1) % self.capacity
+            self.count -= due - 1
+            self.dropped += due - 1
+            return self.pop()
+
+    def clear(self):
+        with self.condition:
+            self.count = 0
+            self.generation += 1
+            self.condition.notify_all()
+
+
+class FrameCache:
+    """LRU cache of decoded frames keyed by frame index, bounded by total bytes."""
+
+    def __init__(self, max_bytes=FRAME_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, index):
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is not None:
+                self.frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        if frame.nbytes > self.max_bytes:
+            return
+        # Cached frames are shared with callers, so guard them against edits
+        frame.flags.writeable = False
+        with self.lock:
+            previous = self.frames.pop(index, None)
+            if previous is not None:
+                self.size -= previous.nbytes
+            self.frames[index] = frame
+            self.size += frame.nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+
+
+class FrameIndex:
+    """Keyframe positions and frame count of a video, cached in a sidecar file.
+
+    Reverse playback decodes from a keyframe forwards and queues the frames
+    backwards, so it needs to know where each GOP starts; the index is only
+    built once reverse playback is first used. Other seeks go straight
+    through CAP_PROP_POS_FRAMES, since OpenCV already seeks to the keyframe
+    before the target and decodes forward, faster than doing the same
+    through the index.
+    """
+
+    SUFFIX = '.vkindex.npz'
+
+    def __init__(self, keyframes, frame_count):
+        self.keyframes = keyframes  # Sorted frame numbers of keyframes
+        self.frame_count = frame_count
+
+    def keyframe_before(self, index):
+        """Return the last keyframe at or before frame `index`."""
+        position = np.searchsorted(self.keyframes, index, side='right') - 1
+        return int(self.keyframes[max(0, position)])
+
+    @staticmethod
+    def source_stamp(video_path):
+        return file_stamp(video_path)
+
+    @classmethod
+    def open(cls, video_path):
+        """Load the sidecar index, building and saving it if missing or stale."""
+        index = cls.load(video_path)
+        if index is None:
+            index = cls.build(video_path)
+            if index is not None:
+                index.save(video_path)
+        return index
+
+    @classmethod
+    def load(cls, video_path):
+        try:
+            with np.load(video_path + cls.SUFFIX) as data:
+                if np.array_equal(data['stamp'], cls.source_stamp(video_path)):
+                    return cls(data['keyframes'], int(data['frame_count']))
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    @classmethod
+    def build(cls, video_path):
+        """Demux the file without decoding and record keyframes and the frame count."""
+        key_frame_prop = getattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME', None)
+        if key_frame_prop is None:
+            return None
+        try:
+            # CAP_PROP_FORMAT -1 returns raw packets, so grab() skips decoding
+            cap = cv2.VideoCapture(
+                video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        except (cv2.error, TypeError):
+            return None
+        keyframes, frame_count = [], 0
+        try:
+            while cap.grab():
+                if cap.get(key_frame_prop) > 0:
+                    keyframes.append(frame_count)
+                frame_count += 1
+        finally:
+            cap.release()
+        if not keyframes:
+            return None
+        if keyframes[0] != 0:
+            keyframes.insert(0, 0)
+        return cls(np.array(keyframes, dtype=np.int64), frame_count)
+
+    def save(self, video_path):
+        try:
+            np.savez(video_path + self.SUFFIX, stamp=self.source_stamp(video_path),
+                     keyframes=self.keyframes, frame_count=self.frame_count)
+        except OSError as e:
+            print(f"Warning: Unable to save frame index for {video_path}: {e}")
+
+
+class VideoProxy:
+    """All-intra, display-resolution copy of a video used for preview and scrubbing."""
+
+    SUFFIX = '.vkproxy.avi'
+
+    @classmethod
+    def open(cls, video_path, size, frame_count=None, should_stop=lambda: False):
+        """Return the path of an up-to-date proxy, building it first if needed."""
+        proxy_path = video_path + cls.SUFFIX
+        if cls.is_current(video_path, proxy_path, size, frame_count):
+            return proxy_path
+        print(f"Building preview proxy for {video_path}")
+        if cls.build(video_path, proxy_path, size, should_stop):
+            print(f"Preview proxy ready: {proxy_path}")
+            return proxy_path
+        return None
+
+    @staticmethod
+    def is_current(video_path, proxy_path, size, frame_count=None):
+        try:
+            if os.stat(proxy_path).st_mtime_ns < os.stat(video_path).st_mtime_ns:
+                return False
+        except OSError:
+            return False
+        cap = cv2.VideoCapture(proxy_path)
+        try:
+            proxy_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                          int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            proxy_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            cap.release()
+        return proxy_size == tuple(size) and proxy_frames > 0 and (
+            frame_count is None or proxy_frames == frame_count)
+
+    @staticmethod
+    def build(video_path, proxy_path, size, should_stop=lambda: False):
+        """Transcode every frame to MJPEG (intra-only) at `size`."""
+        partial_path = proxy_path[:-len('.avi')] + '.part.avi'
+        cap = cv2.VideoCapture(video_path)
+        writer = cv2.VideoWriter(partial_path, cv2.VideoWriter_fourcc(*'MJPG'),
+                                 cap.get(cv2.CAP_PROP_FPS) or 30.0, tuple(size))
+        if not writer.isOpened():
+            print(f"Warning: Unable to write preview proxy {partial_path}")
+            cap.release()
+            return False
+        resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        completed = False
+        try:
+            while not should_stop():
+                ret, frame = cap.read()
+                if not ret:
+                    completed = True
+                    break
+                cv2.resize(frame, tuple(size), dst=resized,
+                           interpolation=cv2.INTER_AREA)
+                writer.write(resized)
+        finally:
+            cap.release()
+            writer.release()
+        try:
+            if completed:
+                os.replace(partial_path, proxy_path)
+            else:
+                os.remove(partial_path)
+        except OSError as e:
+            print(f"Warning: Unable to finish preview proxy {proxy_path}: {e}")
+            return False
+        return completed
+
+
+class FrameDecoder:
+    """Owns the VideoCapture and decodes ahead of the playhead on a background thread."""
+
+    # OpenCV seeks to this many frames before the target, then decodes up to it
+    SEEK_BACKOFF = 16
+
+    def __init__(self, video_path, ring_frames=None, ring_bytes=None, cache_bytes=FRAME_CACHE_BYTES,
+                 proxy_size=None):
+        self.video_path = video_path
+        self.cache = FrameCache(cache_bytes)
+        self.cap = cv2.VideoCapture(video_path)
+        self.lock = threading.Lock()  # Guards self.cap, self.position and self.next_index
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.ring = FrameRing((max(1, height), max(1, width), 3),
+                              ring_frames, ring_bytes)
+        self.chunk = None  # Reverse playback decode buffer, allocated on first use
+        self.position = 0  # Index of the frame the next cap.read() returns
+        self.next_index = 0  # Index of the next frame the thread will emit
+        self.step = 1  # Frames between emitted frames, negative for reverse
+        self.eof = False
+        self.index = None  # FrameIndex, available once loaded or built
+        self.index_requested = False  # Whether reverse playback asked for the index
+        # Preview from a downscaled proxy only when the source is larger than it
+        self.proxy_size = proxy_size if proxy_size is not None and (
+            width > proxy_size[0] or height > proxy_size[1]) else None
+        self.proxy_active = False
+        self.source_cap = None  # Full-resolution capture for read_source_frame
+        self.running = threading.Event()
+        self.wake = threading.Event()  # Set by resume() and request_seek()
+        self.seek_lock = threading.Lock()  # Guards seek_target and seek_result
+        self.seek_target = None  # Latest requested seek, None when serviced
+        self.seek_result = None  # (index, frame) of the last serviced seek
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        if self.cap.isOpened():
+            self.thread.start()
+            threading.Thread(target=self._prepare, daemon=True).start()
+
+    def _prepare(self):
+        """Load an existing frame index, then switch to the preview proxy once it exists."""
+        index = FrameIndex.load(self.video_path)
+        if index is not None and index.frame_count > 0:
+            self.frame_count = index.frame_count
+            self.index = index
+        if self.proxy_size is None or self.stopped:
+            return
+        proxy_path = VideoProxy.open(
+            self.video_path, self.proxy_size, index.frame_count if index else None,
+            should_stop=lambda: self.stopped)
+        if proxy_path is not None and not self.stopped:
+            self._switch_to_proxy(proxy_path)
+
+    def _switch_to_proxy(self, proxy_path):
+        cap = cv2.VideoCapture(proxy_path)
+        if not cap.isOpened():
+            return
+        with self.lock:
+            self.cap.release()
+            self.cap = cap
+            self.proxy_active = True
+            # Every proxy frame is a keyframe, so the source index no longer applies
+            self.index = None
+            self.position = 0
+            self.chunk = None
+            self.cache.clear()
+            self.ring.reset((self.proxy_size[1], self.proxy_size[0], 3))
+            self.eof = False
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def resume(self):
+        self.running.set()
+        self.wake.set()
+
+    def pause(self):
+        self.running.clear()
+
+    def set_step(self, step, playhead):
+        """Emit every `step`th frame after `playhead`, backwards if `step` is negative."""
+        if step < 0:
+            self._request_index()
+        with self.lock:
+            if step == self.step:
+                return
+            self.ring.clear()
+            self.step = step
+            self.next_index = max(0, playhead + step)
+            self.eof = False
+
+    def _request_index(self):
+        """Build the frame index in the background the first time reverse playback needs it."""
+        if self.index is None and not self.index_requested and not self.proxy_active:
+            self.index_requested = True
+            threading.Thread(target=self._build_index, daemon=True).start()
+
+    def _build_index(self):
+        index = FrameIndex.open(self.video_path)
+        with self.lock:
+            if index is not None and index.frame_count > 0 and not self.proxy_active:
+                self.frame_count = index.frame_count
+                self.index = index
+
+    def _run(self):
+        while not self.stopped:
+            if self.seek_target is not None:
+                self._service_seek()
+                continue
+            if not self.running.is_set():
+                self.wake.wait(0.1)
+                self.wake.clear()
+                continue
+            if self.eof:
+                time.sleep(0.05)
+                continue
+            if self.step > 0:
+                self._decode_forward()
+            else:
+                self._decode_reverse_chunk()
+
+    def _decode_forward(self):
+        reserved = self.ring.reserve(timeout=0.1)
+        if reserved is None:
+            return
+        slot, generation = reserved
+        with self.lock:
+            if generation != self.ring.generation or self.step <= 0 or not self.cap.isOpened():
+                return
+            index = self.next_index
+            cached = self.cache.get(index)
+            if cached is not None:
+                self.ring.slots[slot] = cached
+                self.next_index = index + self.step
+                self.ring.commit(slot, generation, index)
+                return
+            self._position(index)
+            ret, frame = self.cap.read(self.ring.slots[slot])
+            if not ret:
+                self.eof = True
+                return
+            if frame.base is not self.ring.slots:
+                self.ring.slots[slot] = frame
+            self.position = index + 1
+            self.next_index = index + self.step
+            self.ring.commit(slot, generation, index)
+
+    def _decode_reverse_chunk(self):
+        """Decode one GOP-aligned chunk forwards, then queue its frames backwards.
+
+        The chunk is decoded into a private buffer while the ring still holds
+        the previous chunk, so the consumer never waits on backwards seeks.
+        """
+        with self.lock:
+            generation = self.ring.generation
+            step = -self.step
+            end = self.next_index
+            if step <= 0 or end < 0 or not self.cap.isOpened():
+                self.eof = end < 0
+                return
+            # A chunk spans back to the keyframe before `end`, so every frame
+            # of a GOP is decoded once, as far as REVERSE_CHUNK_BYTES allows;
+            # without an index it falls back to REVERSE_CHUNK_FRAMES
+            frame_shape = self.ring.slots.shape[1:]
+            capacity = max(2, REVERSE_CHUNK_BYTES // int(np.prod(frame_shape)))
+            keyframe = self.index.keyframe_before(end) if self.index is not None else None
+            frames = REVERSE_CHUNK_FRAMES if keyframe is None else (end - keyframe) // step + 1
+            frames = max(2, min(frames, capacity))
+            if self.chunk is None or len(self.chunk) < frames or self.chunk.shape[1:] != frame_shape:
+                self.chunk = np.empty((frames,) + frame_shape, np.uint8)
+            start = max(0, end - (frames - 1) * step)
+            if keyframe is not None:
+                start = max(start, keyframe)
+            # Only frames that land on the step are retrieved; the rest are
+            # grabbed so the decoder keeps its reference frames
+            start = end - (end - start) // step * step
+            self._position(start)
+
+        indices = list(range(start, end + 1, step))
+        for position in range(start, end + 1):
+            with self.lock:
+                if generation != self.ring.generation:
+                    return
+                if (position - start) % step:
+                    ret = self.cap.grab()
+                else:
+                    ret, frame = self.cap.read(self.chunk[(position - start) // step])
+                    if ret and frame.base is not self.chunk:
+                        self.chunk[(position - start) // step] = frame
+                if not ret:
+                    # The index or frame count overshot the real end of the stream
+                    indices = [i for i in indices if i < position]
+                    self.position = position
+                    break
+                self.position = position + 1
+
+        for index in reversed(indices):
+            slot = self._reserve(generation)
+            if slot is None:
+                return
+            with self.lock:
+                if generation != self.ring.generation:
+                    return
+                self.ring.slots[slot] = self.chunk[(index - start) // step]
+                self.ring.commit(slot, generation, index)
+
+        with self.lock:
+            if generation == self.ring.generation:
+                self.next_index = start - step
+                self.eof = self.next_index < 0
+
+    def _reserve(self, generation):
+        """Wait for a free ring slot, giving up if the ring is cleared or the decoder stops."""
+        while not self.stopped and generation == self.ring.generation:
+            reserved = self.ring.reserve(timeout=0.1)
+            if reserved is not None:
+                slot, reserved_generation = reserved
+                return slot if reserved_generation == generation else None
+        return None
+
+    def _position(self, index):
+        """Move the capture so the next read returns frame `index`. Caller holds the lock."""
+        if index == self.position:
+            return
+        # A seek decodes forward from the keyframe before (index - SEEK_BACKOFF);
+        # roll forward from the current position instead when that is shorter
+        if self.index is not None:
+            seek_cost = index - self.index.keyframe_before(max(0, index - self.SEEK_BACKOFF))
+        else:
+            seek_cost = self.SEEK_BACKOFF
+        if not 0 < index - self.position <= seek_cost:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self.position = index
+        # Frames before the target are grabbed but never retrieved, which
+        # skips their color conversion and copy
+        while self.position < index and self.cap.grab():
+            self.position += 1
+
+    def request_seek(self, index):
+        """Queue a seek to frame `index`; requests not yet serviced are replaced."""
+        with self.seek_lock:
+            self.seek_target = index
+        # Abandon any read-ahead in flight so the thread picks the seek up now
+        self.ring.clear()
+        self.wake.set()
+
+    def _service_seek(self):
+        with self.seek_lock:
+            index, self.seek_target = self.seek_target, None
+        if index is None:
+            return
+        frame = self.read_frame(index)
+        if frame is not None:
+            with self.seek_lock:
+                self.seek_result = (index, frame)
+
+    def poll_seek(self):
+        """Return (index, frame) for the latest completed seek, or None."""
+        with self.seek_lock:
+            result, self.seek_result = self.seek_result, None
+        return result
+
+    def next_frame(self, is_due=None):
+        """Return (index, frame) for the next frame the thread has ready, or None.
+
+        With `is_due`, return the newest ready frame for which it holds instead,
+        skipping the ones before it.
+        """
+        ready = self.ring.pop() if is_due is None else self.ring.pop_latest(is_due)
+        if ready is not None:
+            self.cache.put(*ready)
+        return ready
+
+    def read_frame(self, index):
+        """Return frame `index`, from the cache or decoded now; read-ahead resumes after it."""
+        with self.lock:
+            self.ring.clear()
+            frame = self.cache.get(index)
+            if frame is None:
+                self._position(index)
+                ret, frame = self.cap.read()
+                if not ret:
+                    self.eof = True
+                    return None
+                self.position = index + 1
+                self.cache.put(index, frame)
+            self.next_index = index + self.step
+            self.eof = self.next_index < 0
+            return frame
+
+    def read_source_frame(self, index):
+        """Decode frame `index` from the original file, bypassing the proxy."""
+        if self.source_cap is None:
+            self.source_cap = cv2.VideoCapture(self.video_path)
+        self.source_cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self.source_cap.read()
+        return frame if ret else None
+
+    def release(self):
+        self.stopped = True
+        self.running.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        with self.lock:
+            self.cap.release()
+            if self.source_cap is not None:
+                self.source_cap.release()
+
+
+def mirror_column_map(width, left_level, right_level):
+    """Source column for every output column after the left then right mirror effects."""
+    columns = np.arange(width)
+
+    def mirror_map(level, side):
+        mapping = columns.copy()
+        if level == 1:
+            half = width // 2
+            if side == 'left':
+                mapping[half:2 * half] = 2 * half - 1 - columns[half:2 * half]
+            else:
+                mapping[:half] = width - 1 - columns[:half]
+        elif level == 2:
+            third = width // 3
+            first, second = columns[:third], columns[third:2 * third]
+            if side == 'left':
+                mapping[third:2 * third] = 2 * third - 1 - second
+                mapping[:third] = 3 * third - 1 - first
+            else:
+                mapping[third:2 * third] = 4 * third - 1 - second
+                mapping[2 * third:3 * third] = 3 * third - 1 - \
+                    columns[2 * third:3 * third]
+        elif level == 3:
+            quarter = width // 4
+            for i in range(4):
+                if i % 2 == (0 if side == 'left' else 1):
+                    span = columns[i * quarter:(i + 1) * quarter]
+                    mapping[i * quarter:(i + 1) * quarter] = (2 * i + 1) * quarter - 1 - span
+        return mapping
+
+    # Each mirror reads the frame the previous one produced
+    return mirror_map(left_level, 'left')[mirror_map(right_level, 'right')]
+
+
+def mirror_row_map(height, mirror_up, mirror_down):
+    """Source row for every output row after the mirror up then mirror down effects."""
+    rows = np.arange(height)
+    half = height // 2
+    up_map, down_map = rows.copy(), rows.copy()
+    if mirror_up:
+        up_map[half:2 * half] = 2 * half - 1 - rows[half:2 * half]
+    if mirror_down:
+        down_map[:height - half] = height - 1 - rows[:height - half]
+    return up_map[down_map]
+
+
+def build_geometry_maps(attributes, source_size, output_size, pan_scale=1, nearest=False):
+    """Compose display scaling, zoom/pan, rotation, flips and mirrors into remap maps.
+
+    Every stage is a pure coordinate transform, so instead of running each one
+    over the frame, output pixel coordinates are walked back through the stages
+    (last to first) to the source pixel they come from. Returns None when the
+    result would be the source frame unchanged. The pan offsets are scaled by
+    pan_scale, one factor or an (x, y) pair, for maps built at another size
+    than the one the pan was set at.
+    With nearest, the maps are rounded to whole pixels for cv2.INTER_NEAREST.
+    """
+    source_width, source_height = source_size
+    width, height = output_size
+    identity = (source_width, source_height) == (width, height)
+
+    # Mirrors, applied last, only move whole rows and columns
+    columns = mirror_column_map(
+        width, attributes.mirror_left_level, attributes.mirror_right_level)
+    rows = mirror_row_map(height, attributes.mirror_up, attributes.mirror_down)
+    identity = identity and not (attributes.mirror_left_level or attributes.mirror_right_level
+                                 or attributes.mirror_up or attributes.mirror_down)
+
+    # Flips
+    if attributes.flip_horizontal:
+        columns = width - 1 - columns
+    if attributes.flip_vertical:
+        rows = height - 1 - rows
+    identity = identity and not (attributes.flip_horizontal or attributes.flip_vertical)
+
+    map_x, map_y = np.meshgrid(columns.astype(np.float32), rows.astype(np.float32))
+
+    # Rotation about the centre, reflecting at the borders like warpAffine did
+    if attributes.rotation_angle != 0:
+        identity = False
+        matrix = cv2.invertAffineTransform(cv2.getRotationMatrix2D(
+            (width // 2, height // 2), attributes.rotation_angle, 1))
+        map_x, map_y = (matrix[0, 0] * map_x + matrix[0, 1] * map_y + matrix[0, 2],
+                        matrix[1, 0] * map_x + matrix[1, 1] * map_y + matrix[1, 2])
+        for coords, size in ((map_x, width), (map_y, height)):
+            np.mod(coords, 2 * size, out=coords)
+            np.copyto(coords, 2 * size - 1 - coords, where=coords > size - 1)
+            np.clip(coords, 0, size - 1, out=coords)
+
+    # Zoom and pan select a crop that is scaled back up to the full size
+    pan_scale_x, pan_scale_y = pan_scale if isinstance(pan_scale, tuple) else (pan_scale,) * 2
+    center_x = width // 2 + round(attributes.pan_x * pan_scale_x)
+    center_y = height // 2 + round(attributes.pan_y * pan_scale_y)
+    new_width, new_height = int(width / attributes.zoom_factor), int(height / attributes.zoom_factor)
+    x1, y1 = max(0, center_x - new_width // 2), max(0, center_y - new_height // 2)
+    x2, y2 = min(width, center_x + new_width // 2), min(height, center_y + new_height // 2)
+    x1, y1 = min(x1, width - 1), min(y1, height - 1)
+    x2, y2 = max(x2, x1 + 1), max(y2, y1 + 1)
+    if (x1, y1, x2, y2) != (0, 0, width, height):
+        identity = False
+        map_x = np.clip(x1 + (map_x + 0.5) * ((x2 - x1) / width) - 0.5, x1, x2 - 1)
+        map_y = np.clip(y1 + (map_y + 0.5) * ((y2 - y1) / height) - 0.5, y1, y2 - 1)
+
+    if identity:
+        return None
+
+    # Finally the downscale from the source to the output size
+    map_x = (map_x + 0.5) * (source_width / width) - 0.5
+    map_y = (map_y + 0.5) * (source_height / height) - 0.5
+    return cv2.convertMaps(map_x.astype(np.float32), map_y.astype(np.float32), cv2.CV_16SC2,
+                           nninterpolation=nearest)
+
+
+@lru_cache(maxsize=8)
+def kaleidoscope_maps(width, height, segments, nearest=False):
+    """Remap maps folding every angle around the centre into one mirrored wedge.
+
+    The circle is split into 2 * segments wedges of 180 / segments degrees,
+    alternately mirrored, all sampling the wedge starting at angle 0. With
+    nearest, the maps are rounded to whole pixels for cv2.INTER_NEAREST.
+    """
+    center_x, center_y = width // 2, height // 2
+    x, y = np.meshgrid(np.arange(width, dtype=np.float32) - center_x,
+                       np.arange(height, dtype=np.float32) - center_y)
+    radius = np.hypot(x, y)
+    wedge = np.pi / segments
+    angle = np.mod(np.arctan2(y, x), 2 * wedge)
+    angle = np.where(angle > wedge, 2 * wedge - angle, angle)
+    map_x = (center_x + radius * np.cos(angle)).astype(np.float32)
+    map_y = (center_y + radius * np.sin(angle)).astype(np.float32)
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2, nninterpolation=nearest)
+
+
+def display_size(width, height):
+    """Size a frame of width x height is shown at in the preview."""
+    if width > DISPLAY_WIDTH or height > DISPLAY_HEIGHT:
+        return DISPLAY_WIDTH, DISPLAY_HEIGHT
+    return width, height
+
+
+class EffectRenderer:
+    """Applies VideoAttributes to frames, caching everything derived from them.
+
+    Per-pixel stages can be split into horizontal bands run on a thread pool;
+    OpenCV releases the GIL, so the bands run in parallel.
+    """
+
+    def __init__(self, bands=RENDER_BANDS):
+        self.bands = max(1, os.cpu_count() or 1) if bands is None else max(1, bands)
+        self.pool = ThreadPoolExecutor(self.bands - 1) if self.bands > 1 else None
+        self.geometry_key = None
+        self.geometry_maps = None
+        self.color_key = None
+        self.color_table = None  # None when brightness and LUT leave colors unchanged
+        self.color_from_gray = False
+        self.color_cube = None  # CubeLut.table() when color_table indexes a 3D LUT
+
+    def geometry(self, frame, attributes, output_size, interpolation=cv2.INTER_LINEAR,
+                 pan_scale=1):
+        """Apply scaling, zoom/pan, rotation, flips and mirrors in a single remap."""
+        height, width = frame.shape[:2]
+        # CV_16SC2 maps carry a fractional part that only linear interpolation
+        # may use, so nearest neighbour gets maps of its own
+        nearest = interpolation == cv2.INTER_NEAREST
+        key = ((width, height), tuple(output_size), pan_scale, nearest, attributes.zoom_factor,
+               attributes.pan_x, attributes.pan_y, attributes.rotation_angle,
+               attributes.flip_horizontal, attributes.flip_vertical,
+               attributes.mirror_left_level, attributes.mirror_right_level,
+               attributes.mirror_up, attributes.mirror_down)
+        if key != self.geometry_key:
+            self.geometry_maps = build_geometry_maps(
+                attributes, (width, height), output_size, pan_scale, nearest)
+            self.geometry_key = key
+        if self.geometry_maps is None:
+            return frame
+        return self._remap(frame, self.geometry_maps, interpolation, cv2.BORDER_REPLICATE)
+
+    def _in_bands(self, height, band):
+        """Call band(top, bottom) for each horizontal band of a frame `height` rows high."""
+        bands = min(self.bands, height // 16)
+        if bands <= 1:
+            band(0, height)
+            return
+        bounds = [height * i // bands for i in range(bands + 1)]
+        # The calling thread takes the first band itself
+        futures = [self.pool.submit(band, top, bottom)
+                   for top, bottom in zip(bounds[1:], bounds[2:])]
+        band(bounds[0], bounds[1])
+        for future in futures:
+            future.result()
+
+    def _remap(self, frame, maps, interpolation, border_mode):
+        """cv2.remap, with each band of output rows using its slice of the maps."""
+        map1, map2 = maps
+        output = np.empty(map1.shape[:2] + frame.shape[2:], frame.dtype)
+
+        def band(top, bottom):
+            # Maps built for nearest neighbour have no fractional part
+            rows = None if map2 is None else map2[top:bottom]
+            cv2.remap(frame, map1[top:bottom], rows, interpolation,
+                      dst=output[top:bottom], borderMode=border_mode)
+
+        self._in_bands(output.shape[0], band)
+        return output
+
+    def color(self, frame, brightness, lut, rgb=False):
+        """Apply brightness and the LUT as one table lookup, optionally ending in RGB."""
+        self._update_color_table(brightness, lut, rgb)
+        if self.color_table is None and brightness == 0 and not rgb:
+            return frame
+        output = np.empty_like(frame)
+        self._in_bands(frame.shape[0], lambda top, bottom: self._color_rows(
+            frame[top:bottom], output[top:bottom], brightness, rgb))
+        return output
+
+    def _color_rows(self, rows, output, brightness, rgb):
+        if self.color_cube is not None:
+            # The index table folds in brightness, and the cube's table
+            # already holds the colors in output channel order
+            CubeLut.apply(rows, self.color_table, self.color_cube, output)
+            return
+        if self.color_from_gray:
+            # Colormaps index by the grey level of the brightened frame; the
+            # table already holds the colors in output channel order
+            if brightness != 0:
+                rows = cv2.convertScaleAbs(rows, alpha=1, beta=brightness * 25)
+            cv2.applyColorMap(cv2.cvtColor(rows, cv2.COLOR_BGR2GRAY), self.color_table,
+                              dst=output)
+            return
+        if self.color_table is not None:
+            rows = cv2.LUT(rows, self.color_table, dst=output)
+        elif brightness != 0:
+            # Without a LUT the SIMD arithmetic beats a table lookup
+            rows = cv2.convertScaleAbs(rows, dst=output, alpha=1, beta=brightness * 25)
+        if rgb:
+            cv2.cvtColor(rows, cv2.COLOR_BGR2RGB, dst=output)
+
+    def _update_color_table(self, brightness, lut, rgb):
+        lut_key = (lut.shape, lut.tobytes()) if isinstance(lut, np.ndarray) else lut
+        key = (brightness, lut_key, rgb)
+        if key == self.color_key:
+            return
+        self.color_key = key
+        self.color_from_gray = False
+        self.color_cube = None
+        # Same mapping as cv2.convertScaleAbs(frame, alpha=1, beta=brightness * 25)
+        levels = np.clip(np.abs(np.arange(256) + brightness * 25), 0, 255).astype(np.uint8)
+        if lut is None or (isinstance(lut, np.ndarray) and lut.shape != (256, 1, 3)):
+            if lut is not None:
+                print("Error: LUT must have shape (256, 1, 3).", file=sys.stderr)
+            self.color_table = None
+        elif isinstance(lut, np.ndarray):
+            self.color_table = np.ascontiguousarray(lut[levels])
+        elif isinstance(lut, CubeLut):
+            self.color_table = lut.index_table(levels)
+            self.color_cube = lut.table(rgb)
+        else:
+            colors = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), lut)
+            self.color_table = np.ascontiguousarray(colors[:, :, ::-1]) if rgb else colors
+            self.color_from_gray = True
+
+    def render(self, frame, attributes, lut, output_size, rgb=False,
+               interpolation=cv2.INTER_LINEAR, divisor=1, kaleidoscope_divisor=1):
+        """Run the full effect chain, optionally at 1/divisor of the output size."""
+        width, height = output_size
+
+        # Apply display scaling, zoom/pan, rotation, flips and mirrors
+        # in one remap, rebuilt only when those attributes change; the pan
+        # is in output pixels, so it shrinks with the working resolution
+        frame = self.geometry(
+            frame, attributes, (width // divisor, height // divisor), interpolation,
+            pan_scale=1 / divisor)
+
+        # Apply kaleidoscope effect if enabled
+        if attributes.kaleidoscope_segments > 0:
+            frame = self.kaleidoscope(
+                frame, attributes.kaleidoscope_segments, interpolation, kaleidoscope_divisor)
+
+        # Apply brightness, LUT and the optional BGR to RGB conversion from
+        # one table, rebuilt only when brightness or the LUT changes
+        frame = self.color(frame, attributes.brightness, lut, rgb)
+
+        # Scale a reduced working resolution back up
+        if divisor > 1:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+        return frame
+
+    def kaleidoscope(self, frame, segments, interpolation=cv2.INTER_LINEAR, divisor=1):
+        """Mirrored-wedge kaleidoscope in one remap, whatever the segment count.
+
+        With a divisor above 1 the pattern is computed at that fraction of the
+        frame size and scaled back up.
+        """
+        height, width = frame.shape[:2]
+        if divisor > 1:
+            small = cv2.resize(frame, (width // divisor, height // divisor),
+                               interpolation=cv2.INTER_LINEAR)
+            small = self.kaleidoscope(small, segments, interpolation)
+            return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+        maps = kaleidoscope_maps(width, height, segments, interpolation == cv2.INTER_NEAREST)
+        return self._remap(frame, maps, interpolation, cv2.BORDER_REFLECT)
+
+
+class PresentationClock:
+    """Schedules frames against wall-clock deadlines derived from the source frame rate."""
+
+    def __init__(self):
+        self.rate = None  # Source frames per second, negative in reverse; None when stopped
+        self.origin_time = 0.0
+        self.origin_frame = 0
+        self.drift = 0.0  # Smoothed lateness of shown frames, in seconds
+
+    def start(self, frame, rate):
+        """Start counting from `frame` now, advancing `rate` source frames per second."""
+        self.origin_time = time.perf_counter()
+        self.origin_frame = frame
+        self.rate = rate
+
+    def stop(self):
+        self.rate = None
+
+    def deadline(self, frame):
+        return self.origin_time + (frame - self.origin_frame) / self.rate
+
+    def is_due(self, frame, now=None):
+        return (time.perf_counter() if now is None else now) >= self.deadline(frame)
+
+    def presented(self, frame):
+        """Record that `frame` was shown now, for drift reporting."""
+        lateness = time.perf_counter() - self.deadline(frame)
+        self.drift = 0.9 * self.drift + 0.1 * lateness
+
+
+class QualityGovernor:
+    """Trades rendering quality for speed when frames take longer than their budget.
+
+    Render times are smoothed and compared with the share of the frame
+    interval rendering may use. Quality drops a level after a few frames over
+    budget and only comes back after a longer run well under it. A level that
+    already proved too slow is retried much less often, so the governor does
+    not oscillate between two levels.
+    """
+
+    # (name, interpolation, working resolution divisor, kaleidoscope resolution divisor)
+    LEVELS = (
+        ("full", cv2.INTER_LINEAR, 1, 1),
+        ("nearest", cv2.INTER_NEAREST, 1, 1),
+        ("kaleidoscope 1/2", cv2.INTER_NEAREST, 1, 2),
+        ("1/2 res", cv2.INTER_NEAREST, 2, 1),
+        ("1/4 res", cv2.INTER_NEAREST, 4, 1),
+    )
+
+    def __init__(self, headroom=0.75, degrade_frames=5, restore_frames=30):
+        self.level = 0
+        self.budget = None  # Seconds one frame may take to render; None while not playing
+        self.render_time = 0.0  # Smoothed render time at the current level, in seconds
+        self.headroom = headroom  # Share of the frame interval left for rendering
+        self.degrade_frames = degrade_frames
+        self.restore_frames = restore_frames
+        self.frames_at_level = 0
+        self.level_times = [None] * len(self.LEVELS)  # Last smoothed time seen at each level
+
+    @property
+    def settings(self):
+        return self.LEVELS[self.level]
+
+    def set_frame_interval(self, interval):
+        self.budget = None if interval is None else interval * self.headroom
+
+    def record(self, seconds):
+        """Account for one rendered frame and change level if warranted."""
+        if self.frames_at_level == 0:
+            self.render_time = seconds
+        else:
+            self.render_time = 0.8 * self.render_time + 0.2 * seconds
+        self.frames_at_level += 1
+        if self.budget is None:
+            return
+        if (self.render_time > self.budget and self.frames_at_level >= self.degrade_frames
+                and self.level < len(self.LEVELS) - 1):
+            self._set_level(self.level + 1)
+        elif (self.render_time < self.budget / 2 and self.frames_at_level >= self.restore_frames
+              and self.level > 0):
+            # Retry a level that was too slow only after a much longer wait,
+            # in case the effects or the content have changed since
+            previous = self.level_times[self.level - 1]
+            if (previous is None or previous <= self.budget
+                    or self.frames_at_level >= 10 * self.restore_frames):
+                self._set_level(self.level - 1)
+
+    def _set_level(self, level):
+        self.level_times[self.level] = self.render_time
+        self.level = level
+        self.frames_at_level = 0
+
+
+class DisplaySurface:
+    """Keeps one Tk photo image on a label and pastes each new frame into it."""
+
+    def __init__(self, label):
+        self.label = label
+        self.photo = None
+        self.size = None
+
+    def show(self, frame_rgb):
+        height, width = frame_rgb.shape[:2]
+        image = Image.fromarray(frame_rgb)
+        if (width, height) != self.size:
+            # Only a size change needs a new Tk image
+            self.photo = ImageTk.PhotoImage(image=image)
+            self.size = (width, height)
+            self.label.configure(image=self.photo)
+        else:
+            self.photo.paste(image)
+
+    def clear(self):
+        self.label.configure(image='')
+        self.photo = None
+        self.size = None
+
+
 class VideoKaleidoscope:
-    def __init__(self, input_video_path):
+    def __init__(self, input_video_path, ring_frames=RING_BUFFER_FRAMES, ring_bytes=RING_BUFFER_BYTES):
         self.video_path = input_video_path
-        self.cap = cv2.VideoCapture(input_video_path)
-        if not self.cap.isOpened():
+        self.ring_frames = ring_frames
+        self.ring_bytes = ring_bytes
+        self.decoder = FrameDecoder(
+            input_video_path, ring_frames, ring_bytes, FRAME_CACHE_BYTES,
+            proxy_size=(DISPLAY_WIDTH, DISPLAY_HEIGHT))
+        if not self.decoder.isOpened():
             print(f"Error: Unable to open video file {input_video_path}")
             sys.exit(1)
         self.attributes = VideoAttributes()
         self.current_frame = None
+        self.frame_index = -1  # Index of the frame in self.current_frame
+        self.slider_position = 0  # Last position set on the seek slider by playback
         self.video_stopped = False
+        self.renderer = EffectRenderer()
+        # Full-resolution snapshots keep their own maps and color table,
+        # so taking one doesn't evict the preview's
+        self.snapshot_renderer = EffectRenderer()
+        self.governor = QualityGovernor()
         self.base_lut = None  # Initialize base LUT
         self.modified_lut = cv2.applyColorMap(
             np.arange(256, dtype=np.uint8), cv2.COLORMAP_RAINBOW
@@ -163,12 +1622,21 @@ class VideoKaleidoscope:
         # Set up video display area
         self.video_label = tk.Label(self.root)
         self.video_label.pack()
+        self.display = DisplaySurface(self.video_label)
 
         # Slider for video position (seek bar)
         self.seek_slider = tk.Scale(self.root, from_=0, to=1000, orient=tk.HORIZONTAL,
                                     label="Video Position", command=self.set_video_position)
         self.seek_slider.pack(fill=tk.X)
 
+        # Playback timing report
+        self.status_var = StringVar(self.root)
+        tk.Label(self.root, textvariable=self.status_var,
+                 anchor='w').pack(fill=tk.X)
+        self.clock = PresentationClock()
+        self.status_time = time.perf_counter()
+        self.status_frames = 0
+
         # Set up controls in separate windows
         self.create_control_window()
 
@@ -184,8 +1652,9 @@ class VideoKaleidoscope:
 
     def apply_modified_lut(self):
         """Applies modifications to the base LUT and updates the modified LUT."""
-        if isinstance(self.base_lut, int):
-            # OpenCV colormap LUTs (predefined) are integers
+        if isinstance(self.base_lut, (int, CubeLut)):
+            # OpenCV colormap LUTs (predefined) are integers, and 3D LUTs are
+            # never modified in place
             self.modified_lut = self.base_lut
         elif self.base_lut is not None:
             # Custom LUTs are NumPy arrays
@@ -193,21 +1662,27 @@ class VideoKaleidoscope:
 
     def invert_lut(self, event=None):
         """Invert the LUT."""
-        if self.modified_lut is not None:
+        if isinstance(self.modified_lut, CubeLut):
+            self.modified_lut = self.modified_lut.inverted()
+        elif self.modified_lut is not None:
             self.modified_lut = np.flip(self.modified_lut, axis=0)
         else:
             print("Error: LUT not properly initialized.")
 
     def shift_lut_left(self, event=None):
         """Shift LUT values to the left."""
-        if self.modified_lut is not None and self.modified_lut.ndim == 3:
+        if isinstance(self.modified_lut, CubeLut):
+            print("Error: 3D LUTs can't be shifted.")
+        elif self.modified_lut is not None and self.modified_lut.ndim == 3:
             self.modified_lut = np.roll(self.modified_lut, -8, axis=0)
         else:
             print("Error: LUT not properly initialized.")
 
     def shift_lut_right(self, event=None):
         """Shift LUT values to the right."""
-        if self.modified_lut is not None and self.modified_lut.ndim == 3:
+        if isinstance(self.modified_lut, CubeLut):
+            print("Error: 3D LUTs can't be shifted.")
+        elif self.modified_lut is not None and self.modified_lut.ndim == 3:
             self.modified_lut = np.roll(self.modified_lut, 8, axis=0)
         else:
             print("Error: LUT not properly initialized.")
@@ -363,22 +1838,31 @@ class VideoKaleidoscope:
         self.icons += [pan_up_icon, pan_down_icon,
                        pan_left_icon, pan_right_icon, pan_center_icon]
 
+    def show_frame(self, index, frame):
+        self.frame_index = index
+        self.current_frame = frame
+        self.apply_effects()
+        self.status_frames += 1
+
     def set_video_position(self, position):
-        if self.cap.isOpened():
-            total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            frame_number = int((int(position) / 1000.0) * total_frames)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            ret, frame = self.cap.read()
-            if ret:
-                self.current_frame = frame
-                self.apply_effects()
+        position = int(position)
+        # The Scale also calls back for positions set by update_seek_slider
+        if position == self.slider_position:
+            return
+        self.slider_position = position
+        if self.decoder.isOpened():
+            total_frames = self.decoder.frame_count
+            frame_number = int((position / 1000.0) * total_frames)
+            # Dragging fires many events; the decoder thread only decodes the latest
+            self.decoder.request_seek(frame_number)
 
     def update_seek_slider(self):
-        if self.cap.isOpened():
-            total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-            position = int((current_frame / total_frames) * 1000)
-            self.seek_slider.set(position)
+        if self.decoder.isOpened() and self.decoder.frame_count > 0:
+            total_frames = self.decoder.frame_count
+            position = int(((self.frame_index + 1) / total_frames) * 1000)
+            if position != self.slider_position:
+                self.slider_position = position
+                self.seek_slider.set(position)
 
     def set_kaleidoscope_segments(self, segments):
         self.attributes.kaleidoscope_segments = segments
@@ -392,24 +1876,26 @@ class VideoKaleidoscope:
 
     def toggle_pause(self):
         if self.video_stopped:
-            self.cap = cv2.VideoCapture(self.video_path)
-            if not self.cap.isOpened():
+            self.decoder = FrameDecoder(
+                self.video_path, self.ring_frames, self.ring_bytes, FRAME_CACHE_BYTES,
+                proxy_size=(DISPLAY_WIDTH, DISPLAY_HEIGHT))
+            if not self.decoder.isOpened():
                 print(f"Error: Unable to reopen video file {self.video_path}")
                 return
+            self.frame_index = -1
             self.video_stopped = False
             self.attributes.paused = False
         else:
             self.attributes.paused = not self.attributes.paused
 
-        if self.attributes.paused and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if ret:
-                self.current_frame = frame
-                self.apply_effects()
+        if self.attributes.paused and self.decoder.isOpened():
+            ready = self.decoder.next_frame()
+            if ready is not None:
+                self.show_frame(*ready)
 
     def stop_video(self):
-        self.cap.release()
-        self.video_label.configure(image='')
+        self.decoder.release()
+        self.display.clear()
         self.video_stopped = True
 
     def toggle_mirror_level(self, side):
@@ -486,104 +1972,34 @@ class VideoKaleidoscope:
             self.base_lut = None
             self.modified_lut = None
         else:
-            lut_function = LUTS.get(lut_name)
-            if lut_function is None:
+            lut = get_lut(lut_name)
+            if lut is None:
                 print(f"Error: LUT '{lut_name}' not found.")
                 return
-            self.base_lut = lut_function() if callable(lut_function) else lut_function
+            self.base_lut = lut
             self.apply_modified_lut()
         if self.attributes.paused:
             self.apply_effects()
 
     def apply_lut(self, frame):
-        if self.modified_lut is not None:
-            if isinstance(self.modified_lut, np.ndarray):
-                if self.modified_lut.shape == (256, 1, 3):
-                    frame = cv2.LUT(frame, self.modified_lut)
-                else:
-                    print("Error: LUT must have shape (256, 1, 3).")
-            else:
-                frame = cv2.applyColorMap(frame, self.modified_lut)
-        return frame
+        return self.snapshot_renderer.color(frame, 0, self.modified_lut)
 
     def snapshot(self):
         if self.current_frame is not None:
-            frame = self.current_frame.copy()
+            frame = None
+            if self.decoder.proxy_active:
+                # The preview shows the proxy, snapshots use the original
+                frame = self.decoder.read_source_frame(self.frame_index)
+            if frame is None:
+                frame = self.current_frame
             height, width = frame.shape[:2]
+            display_width, display_height = display_size(*self.current_frame.shape[1::-1])
 
-            # Apply zoom and pan
-            center_x, center_y = width // 2 + \
-                self.attributes.pan_x, height // 2 + self.attributes.pan_y
-            new_width, new_height = int(
-                width / self.attributes.zoom_factor), int(height / self.attributes.zoom_factor)
-            x1, y1 = max(0, center_x - new_width // 2), max(0,
-                                                            center_y - new_height // 2)
-            x2, y2 = min(width, center_x + new_width //
-                         2), min(height, center_y + new_height // 2)
-            frame = frame[y1:y2, x1:x2]
-            frame = cv2.resize(frame, (width, height))
-
-            # Apply rotation
-            if self.attributes.rotation_angle != 0:
-                matrix = cv2.getRotationMatrix2D(
-                    (width // 2, height // 2), self.attributes.rotation_angle, 1)
-                frame = cv2.warpAffine(
-                    frame, matrix, (width, height), borderMode=cv2.BORDER_REFLECT)
-
-            # Apply flip
-            if self.attributes.flip_horizontal:
-                frame = cv2.flip(frame, 1)
-            if self.attributes.flip_vertical:
-                frame = cv2.flip(frame, 0)
-
-            # Apply mirror effects for the left side
-            if self.attributes.mirror_left_level == 1:
-                left_half = frame[:, :width // 2]
-                frame[:, width // 2:] = cv2.flip(left_half, 1)
-            elif self.attributes.mirror_left_level == 2:
-                third_width = width // 3
-                left = frame[:, :third_width]
-                right = frame[:, 2 * third_width:]
-                min_width = min(left.shape[1], right.shape[1])
-                frame[:, third_width:third_width +
-                      min_width] = cv2.flip(left[:, :min_width], 1)
-                frame[:, :min_width] = cv2.flip(right[:, :min_width], 1)
-            elif self.attributes.mirror_left_level == 3:
-                quarter_width = width // 4
-                for i in range(4):
-                    if i % 2 == 0:
-                        frame[:, i * quarter_width:(i + 1) * quarter_width] = cv2.flip(
-                            frame[:, i * quarter_width:(i + 1) * quarter_width], 1)
-
-            # Apply mirror effects for the right side
-            if self.attributes.mirror_right_level == 1:
-                right_half = frame[:, width // 2:]
-                frame[:, :width // 2] = cv2.flip(right_half, 1)
-            elif self.attributes.mirror_right_level == 2:
-                third_width = width // 3
-                left = frame[:, :third_width]
-                right = frame[:, 2 * third_width:]
-                min_width = min(left.shape[1], right.shape[1])
-                frame[:, third_width:third_width +
-                      min_width] = cv2.flip(right[:, :min_width], 1)
-                frame[:, 2 * third_width:2 * third_width +
-                      min_width] = cv2.flip(left[:, :min_width], 1)
-            elif self.attributes.mirror_right_level == 3:
-                quarter_width = width // 4
-                for i in range(4):
-                    if i % 2 == 1:
-                        frame[:, i * quarter_width:(i + 1) * quarter_width] = cv2.flip(
-                            frame[:, i * quarter_width:(i + 1) * quarter_width], 1)
-
-            # Apply mirror up effect
-            if self.attributes.mirror_up:
-                top_half = frame[:height // 2, :]
-                frame[height // 2:, :] = cv2.flip(top_half, 0)
-
-            # Apply mirror down effect
-            if self.attributes.mirror_down:
-                bottom_half = frame[height // 2:, :]
-                frame[:height // 2, :] = cv2.flip(bottom_half, 0)
+            # Apply zoom/pan, rotation, flips and mirrors at full resolution;
+            # the pan is in preview pixels, so it scales up to the frame
+            frame = self.snapshot_renderer.geometry(
+                frame, self.attributes, (width, height),
+                pan_scale=(width / display_width, height / display_height))
 
             # Apply LUT
             frame = self.apply_lut(frame)
@@ -596,24 +2012,22 @@ class VideoKaleidoscope:
             print(f'Snapshot saving in progress as {filename}')
 
     def frame_forward(self):
-        if self.cap.isOpened():
+        if self.decoder.isOpened():
             self.attributes.paused = True
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES,
-                         self.cap.get(cv2.CAP_PROP_POS_FRAMES) + 1)
-            ret, frame = self.cap.read()
-            if ret:
-                self.current_frame = frame
-                self.apply_effects()
+            self.decoder.pause()
+            frame_number = self.frame_index + 1
+            frame = self.decoder.read_frame(frame_number)
+            if frame is not None:
+                self.show_frame(frame_number, frame)
 
     def frame_reverse(self):
-        if self.cap.isOpened():
+        if self.decoder.isOpened():
             self.attributes.paused = True
-            current_frame = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, current_frame - 2))
-            ret, frame = self.cap.read()
-            if ret:
-                self.current_frame = frame
-                self.apply_effects()
+            self.decoder.pause()
+            frame_number = max(0, self.frame_index - 1)
+            frame = self.decoder.read_frame(frame_number)
+            if frame is not None:
+                self.show_frame(frame_number, frame)
 
     def toggle_reverse_playback_speed(self):
         self.attributes.reverse_playback_speed *= 2
@@ -622,143 +2036,109 @@ class VideoKaleidoscope:
 
     def apply_effects(self):
         if self.current_frame is not None:
-            frame = self.current_frame.copy()
+            start = time.perf_counter()
+            frame = self.current_frame
             height, width = frame.shape[:2]
 
             # Resize frame for display if larger than 800x600
-            if width > 800 or height > 600:
-                display_width, display_height = 800, 600
-                frame = cv2.resize(frame, (display_width, display_height))
-            else:
-                display_width, display_height = width, height
-
-            # Apply zoom and pan
-            center_x, center_y = width // 2 + \
-                self.attributes.pan_x, height // 2 + self.attributes.pan_y
-            new_width, new_height = int(
-                width / self.attributes.zoom_factor), int(height / self.attributes.zoom_factor)
-            x1, y1 = max(0, center_x - new_width // 2), max(0,
-                                                            center_y - new_height // 2)
-            x2, y2 = min(width, center_x + new_width //
-                         2), min(height, center_y + new_height // 2)
-            frame = frame[y1:y2, x1:x2]
-            frame = cv2.resize(frame, (display_width, display_height))
-
-            # Apply rotation
-            if self.attributes.rotation_angle != 0:
-                matrix = cv2.getRotationMatrix2D(
-                    (display_width // 2, display_height // 2), self.attributes.rotation_angle, 1)
-                frame = cv2.warpAffine(
-                    frame, matrix, (display_width, display_height), borderMode=cv2.BORDER_REFLECT)
-
-            # Apply flip
-            if self.attributes.flip_horizontal:
-                frame = cv2.flip(frame, 1)
-            if self.attributes.flip_vertical:
-                frame = cv2.flip(frame, 0)
-
-            # Apply brightness adjustment
-            frame = cv2.convertScaleAbs(
-                frame, alpha=1, beta=self.attributes.brightness * 25)
-
-            # Apply mirror effects for the left side
-            if self.attributes.mirror_left_level == 1:
-                left_half = frame[:, :frame.shape[1] // 2]
-                frame[:, frame.shape[1] // 2:] = cv2.flip(left_half, 1)
-            elif self.attributes.mirror_left_level == 2:
-                third_width = frame.shape[1] // 3
-                left = frame[:, :third_width]
-                right = frame[:, 2 * third_width:]
-                min_width = min(left.shape[1], right.shape[1])
-                frame[:, third_width:third_width +
-                      min_width] = cv2.flip(left[:, :min_width], 1)
-                frame[:, :min_width] = cv2.flip(right[:, :min_width], 1)
-            elif self.attributes.mirror_left_level == 3:
-                quarter_width = frame.shape[1] // 4
-                for i in range(4):
-                    if i % 2 == 0:
-                        frame[:, i * quarter_width:(i + 1) * quarter_width] = cv2.flip(
-                            frame[:, i * quarter_width:(i + 1) * quarter_width], 1)
-
-            # Apply mirror effects for the right side
-            if self.attributes.mirror_right_level == 1:
-                right_half = frame[:, frame.shape[1] // 2:]
-                frame[:, :frame.shape[1] // 2] = cv2.flip(right_half, 1)
-            elif self.attributes.mirror_right_level == 2:
-                third_width = frame.shape[1] // 3
-                left = frame[:, :third_width]
-                right = frame[:, 2 * third_width:]
-                min_width = min(left.shape[1], right.shape[1])
-                frame[:, third_width:third_width +
-                      min_width] = cv2.flip(right[:, :min_width], 1)
-                frame[:, 2 * third_width:2 * third_width +
-                      min_width] = cv2.flip(left[:, :min_width], 1)
-            elif self.attributes.mirror_right_level == 3:
-                quarter_width = frame.shape[1] // 4
-                for i in range(4):
-                    if i % 2 == 1:
-                        frame[:, i * quarter_width:(i + 1) * quarter_width] = cv2.flip(
-                            frame[:, i * quarter_width:(i + 1) * quarter_width], 1)
-
-            # Apply mirror up effect
-            if self.attributes.mirror_up:
-                top_half = frame[:frame.shape[0] // 2, :]
-                frame[frame.shape[0] // 2:, :] = cv2.flip(top_half, 0)
-
-            # Apply mirror down effect
-            if self.attributes.mirror_down:
-                bottom_half = frame[frame.shape[0] // 2:, :]
-                frame[:frame.shape[0] // 2, :] = cv2.flip(bottom_half, 0)
-
-            # Apply kaleidoscope effect if enabled
-            if self.attributes.kaleidoscope_segments > 0:
-                frame = self.kaleidoscope_effect(frame)
+            display_width, display_height = display_size(width, height)
 
-            # Apply LUT
-            frame = self.apply_lut(frame)
+            # Under load the governor lowers interpolation quality and the
+            # resolution effects run at; paused frames always get full quality
+            playing = not self.attributes.paused
+            _, interpolation, divisor, kaleidoscope_divisor = (
+                self.governor.settings if playing else QualityGovernor.LEVELS[0])
+
+            # Apply geometry, kaleidoscope, brightness and LUT, ending in RGB
+            frame_rgb = self.renderer.render(
+                frame, self.attributes, self.modified_lut, (display_width, display_height),
+                rgb=True, interpolation=interpolation, divisor=divisor,
+                kaleidoscope_divisor=kaleidoscope_divisor)
 
-            # Convert frame to ImageTk format
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
-            imgtk = ImageTk.PhotoImage(image=img)
+            # Update video label, reusing its Tk image
+            self.display.show(frame_rgb)
 
-            # Update video label
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
+            if playing:
+                self.governor.record(time.perf_counter() - start)
 
             # Update seek slider position
             self.update_seek_slider()
 
     def kaleidoscope_effect(self, frame):
-        height, width = frame.shape[:2]
-        center_x, center_y = width // 2, height // 2
-        mask = np.zeros_like(frame)
-
-        angle_step = 360 // self.attributes.kaleidoscope_segments
-        for i in range(self.attributes.kaleidoscope_segments):
-            angle = i * angle_step
-            matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, 1)
-            rotated = cv2.warpAffine(frame, matrix, (width, height))
-            alpha = 1.0 / self.attributes.kaleidoscope_segments
-            mask = cv2.addWeighted(mask, 1.0, rotated, alpha, 0)
-
-        return mask
+        return self.renderer.kaleidoscope(
+            frame, self.attributes.kaleidoscope_segments)
 
     def update_video(self):
-        if self.cap.isOpened() and not self.attributes.paused:
+        delay = 30  # Poll interval while paused, stopped or at the end of the stream, in ms
+        seek_result = self.decoder.poll_seek() if self.decoder.isOpened() else None
+        if seek_result is not None:
+            self.show_frame(*seek_result)
+            # Restart the clock from the new position
+            self.clock.stop()
+        elif self.decoder.isOpened() and not self.attributes.paused:
+            # Frames are due at the source frame rate scaled by the playback
+            # speed, measured from when playback (re)started
+            speed = self.attributes.playback_speed
             if self.attributes.reverse_playback_speed > 1.0:
-                current_frame = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
-                new_frame = max(0, current_frame -
-                                self.attributes.reverse_playback_speed)
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, new_frame)
-            ret, frame = self.cap.read()
-            if ret:
-                self.current_frame = frame
-                self.apply_effects()
+                # Reverse steps back (speed - 1) frames per update
+                step = -max(1, int(self.attributes.reverse_playback_speed) - 1)
+                rate = step * self.decoder.fps * speed
+            else:
+                # Fast forward only decodes the frames that will be shown,
+                # keeping the display rate at or below twice the source fps
+                step = max(1, int(speed))
+                rate = self.decoder.fps * speed
+            self.decoder.set_step(step, self.frame_index)
+            self.decoder.resume()
+
+            if self.clock.rate != rate:
+                self.clock.start(self.frame_index, rate)
+            # Rendering has one shown-frame interval per frame
+            self.governor.set_frame_interval(abs(step / rate))
+
+            # Only take a frame the decoder thread already has ready, and
+            # skip straight to the newest one if rendering fell behind
+            ready = self.decoder.next_frame(is_due=self.clock.is_due)
+            if ready is not None:
+                self.show_frame(*ready)
+                self.clock.presented(ready[0])
+            until_next = int((self.clock.deadline(self.frame_index + step)
+                              - time.perf_counter()) * 1000)
+            if ready is not None:
+                delay = max(1, until_next)
+            elif self.decoder.ring.count or not self.decoder.eof:
+                # A frame is queued but not yet due, or the decoder is behind,
+                # so check back soon, but not so often that polling competes with it
+                delay = max(BEHIND_POLL_MS, min(5, until_next))
+        else:
+            # Paused stepping reads frames itself; read-ahead would only
+            # carry the capture away from the playhead
+            self.decoder.pause()
+            self.clock.stop()
+            self.governor.set_frame_interval(None)
+
+        self.update_status()
 
         # Schedule the next update
-        self.root.after(
-            int(1000 / (30 * self.attributes.playback_speed)), self.update_video)
+        self.root.after(delay, self.update_video)
+
+    def update_status(self):
+        now = time.perf_counter()
+        if now - self.status_time < 0.5:
+            return
+        shown_fps = self.status_frames / (now - self.status_time)
+        self.status_time, self.status_frames = now, 0
+        if self.clock.rate is None:
+            self.status_var.set(f"Frame {self.frame_index + 1}/{self.decoder.frame_count}")
+            return
+        target_fps = abs(self.clock.rate / (self.decoder.step or 1))
+        self.status_var.set(
+            f"Frame {self.frame_index + 1}/{self.decoder.frame_count}  "
+            f"{shown_fps:.1f}/{target_fps:.1f} fps  "
+            f"drift {self.clock.drift * 1000:+.0f} ms  "
+            f"dropped {self.decoder.ring.dropped}  "
+            f"quality {self.governor.settings[0]} "
+            f"({self.governor.render_time * 1000:.1f}/{self.governor.budget * 1000:.1f} ms)")
 
     def reset(self):
         # Reset all video attributes to their default values
@@ -773,13 +2153,23 @@ class VideoKaleidoscope:
             self.apply_effects()
 
     def exit_program(self):
-        self.cap.release()
+        self.decoder.release()
         self.root.destroy()
 
 
 if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == '--build-lut-bundle':
+        if len(sys.argv) < 4:
+            print("Usage: python video_kaleidoscope.py --build-lut-bundle <bundle_path> <lut_directory>...")
+            sys.exit(1)
+        bundle_path = sys.argv[2]
+        count = LutBundle.build(bundle_path, sys.argv[3:])
+        print(f"Bundled {count} LUTs into {bundle_path}")
+        sys.exit(0)
     if len(sys.argv) < 2 or '-h' in sys.argv or '--help' in sys.argv:
-        print("Usage: python video_kaleidoscope.py <video_path>\n")
+        print("Usage: python video_kaleidoscope.py <video_path>")
+        print("       python video_kaleidoscope.py --build-lut-bundle <bundle_path> <lut_directory>...\n")
+        print(f"LUT bundles ({LutBundle.SUFFIX}) in the luts directory are loaded with the .lut files.\n")
         print("Controls:")
         print("  Play/Pause: Button to toggle between play and pause")
         print("  Stop: Button to stop the video")
@@ -809,6 +2199,10 @@ if __name__ == "__main__":
         print(
             "  Kaleidoscope Segments: Slider to adjust the number of kaleidoscope segments")
         sys.exit(1)
+    elif tk is None:
+        print("Error: The viewer needs Tkinter and Pillow with Tk support; "
+              "batch_render.py renders without them.")
+        sys.exit(1)
     else:
         video_path = sys.argv[1]
         VideoKaleidoscope(video_path)